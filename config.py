@@ -1,4 +1,5 @@
 # config.py
+from pandas.tseries.offsets import DateOffset
 
 # Dán link chia sẻ file Google Drive của bạn vào đây
 # Link này phải ở chế độ "Bất kỳ ai có đường liên kết đều có thể xem"
@@ -7,4 +8,24 @@ HARCODED_GDRIVE_URL = "https://docs.google.com/spreadsheets/d/18lAJxn-Uy1pNLc6qA
 # Các hằng số khác
 VNINDEX_TICKER = 'VNINDEX Index'
 RECOMMENDATION_SHEET = 'Sheet1'
-PRICE_SHEET = 'Price'
\ No newline at end of file
+PRICE_SHEET = 'Price'
+
+# Snapshot ma trận giá (memory-mapped) dùng chung giữa các worker trên cùng máy
+PRICE_SNAPSHOT_DIR = '.cache/price_snapshots'
+# Tuổi tối đa (giây) của snapshot để bỏ qua việc đọc lại sheet giá khi khởi động
+PRICE_SNAPSHOT_MAX_AGE = 6 * 60 * 60
+
+# Ánh xạ mã cổ phiếu -> ngành cho bảng Win Rate theo ngành, vd: {'VCB': 'Ngân hàng'}
+# Mã không có trong ánh xạ được xếp vào nhóm 'Khác'
+SECTOR_MAPPING = {}
+
+# Chu kỳ (giây) bộ làm mới nền tải lại workbook và tính lại kết quả
+REFRESH_INTERVAL_SECONDS = 15 * 60
+
+# Các khoảng thời gian tính hiệu suất (nhãn hiển thị -> (DateOffset, nhãn cột)).
+# Bộ làm mới nền tính sẵn kết quả cho tất cả các khoảng này
+PERIOD_OPTIONS = {
+    '3 tháng': (DateOffset(months=3), '3T'),
+    '6 tháng': (DateOffset(months=6), '6T'),
+    '1 năm': (DateOffset(months=12), '1Y')
+}
\ No newline at end of file
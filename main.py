@@ -1,12 +1,40 @@
 # main.py
 import streamlit as st
 import pandas as pd
+import numpy as np
 
 # Import các module đã được module hóa
-from config import HARCODED_GDRIVE_URL, RECOMMENDATION_SHEET, PRICE_SHEET
-from src.data_loader import load_data_from_gdrive
-from src.analyzer import process_stock_data, calculate_win_rate_summary
-from src.ui import setup_sidebar, display_results_html as display_results
+from config import HARCODED_GDRIVE_URL, RECOMMENDATION_SHEET, PRICE_SHEET, REFRESH_INTERVAL_SECONDS, PERIOD_OPTIONS
+from src.analyzer import calculate_win_rate_summary
+from src.event_index import filter_results
+from src.backtest import run_backtest
+from src.pipeline import build_dataset, dataset_path, load_dataset, save_dataset
+from src.refresher import BackgroundRefresher, DataSnapshot, get_or_start_refresher
+from src.single_flight import flight
+from src.ui import setup_sidebar, setup_filters, setup_backtest_options, display_backtest, display_cube_explorer, display_data_status, display_flight_metrics, display_results_html as display_results
+
+def get_refresher(gdrive_url: str, rec_sheet: str, price_sheet: str) -> BackgroundRefresher:
+    """
+    Bộ làm mới nền duy nhất cho mỗi nguồn trong process: định kỳ tải workbook, làm sạch dữ
+    liệu và tính sẵn kết quả cho mọi khoảng thời gian, rồi thay bản mới vào một cách atomic.
+    Mỗi bản mới được lưu xuống đĩa; khi process khởi động lại, bản đã lưu được phục vụ
+    ngay trong lúc thread nền tải lại dữ liệu.
+    """
+    key = (gdrive_url, rec_sheet, price_sheet)
+
+    def create() -> BackgroundRefresher:
+        periods = list(PERIOD_OPTIONS.values())
+        path = dataset_path(gdrive_url, rec_sheet, price_sheet)
+        persisted = load_dataset(path, [label for _, label in periods])
+        return BackgroundRefresher(
+            lambda previous: build_dataset(gdrive_url, rec_sheet, price_sheet, periods, previous),
+            interval=REFRESH_INTERVAL_SECONDS,
+            key=key,
+            initial=DataSnapshot(*persisted, verified=False) if persisted is not None else None,
+            on_publish=lambda snapshot: save_dataset(path, snapshot.data, snapshot.as_of, snapshot.built_at)
+        )
+
+    return get_or_start_refresher(key, create)
 
 def main():
     """
@@ -14,43 +42,81 @@ def main():
     """
     # --- Cấu hình trang ---
     st.set_page_config(layout="wide", page_title="Bộ lọc Cổ phiếu")
-    
-    
+
+
     # --- Sidebar để lấy tùy chọn của người dùng ---
     period_offset, period_label = setup_sidebar()
+    backtest_options = setup_backtest_options()
+    display_flight_metrics(flight.metrics())
 
     # --- Quy trình chính ---
     if not HARCODED_GDRIVE_URL or HARCODED_GDRIVE_URL == "YOUR_GOOGLE_DRIVE_LINK_HERE":
         st.info("Chào mừng! Vui lòng chỉnh sửa file config.py và thêm link Google Drive vào biến 'HARCODED_GDRIVE_URL' để bắt đầu.")
         return
 
-    with st.spinner("Đang tải và xử lý dữ liệu..."):
+    # 1 + 2. Lấy bản dữ liệu đã xử lý gần nhất từ bộ làm mới nền (không chờ tải)
+    refresher = get_refresher(HARCODED_GDRIVE_URL, RECOMMENDATION_SHEET, PRICE_SHEET)
+    snapshot = refresher.latest()
+    if snapshot is None:
+        # Chỉ xảy ra khi chưa có bản nào, kể cả trên đĩa (lần chạy đầu tiên); các phiên đến cùng lúc
+        # chờ chung lần tải đang chạy (single-flight) và cùng nhận kết quả hoặc lỗi
+        with st.spinner("Đang tải và xử lý dữ liệu lần đầu..."):
+            try:
+                snapshot = refresher.ensure_ready()
+            except Exception as e:
+                st.warning(f"Không thể tải dữ liệu hoặc file không hợp lệ. Vui lòng kiểm tra lại link và định dạng file. ({e})")
+                st.warning("Vui lòng đảm bảo link của bạn được chia sẻ ở chế độ 'Bất kỳ ai có đường liên kết'.")
+                return
+
+    display_data_status(snapshot.as_of, refresher.last_error)
+
+    with st.spinner("Đang xử lý dữ liệu..."):
         try:
-            # 1. Tải dữ liệu
-            df_rec, df_price = load_data_from_gdrive(HARCODED_GDRIVE_URL, RECOMMENDATION_SHEET, PRICE_SHEET)
+            analysis = snapshot.data["analyses"][period_label]
+            results, indexes, cube = analysis["results"], analysis["indexes"], analysis["cube"]
+            filters, date_filtered = {}, False
 
-            if df_rec.empty or df_price.empty:
-                st.warning("Không thể tải dữ liệu hoặc file không hợp lệ. Vui lòng kiểm tra lại link và định dạng file.")
-                return
-            
-            # 2. Xử lý và phân tích
-            df1, df2, df3, df4 = process_stock_data(df_rec, df_price, period_offset, period_label)
-            
-            results = {
-                "Out_sang_MarketPerform": df1,
-                "MarketPerform_sang_Out": df2,
-                "Khuyen_nghi_BUY": df3,
-                "Khuyen_nghi_UnderPerform": df4
-            }
-            
-            # 3. Tính toán Win Rate
-            summary_df = calculate_win_rate_summary(results)
-
-            # 4. Hiển thị kết quả
+            # 3. Lọc kết quả bằng chỉ mục dựng sẵn
+            all_tickers = sorted({t for index in indexes.values() for t in index.ticker_ranges})
+            all_dates = [index.sorted_dates[[0, -1]] for index in indexes.values() if len(index)]
+            if all_dates:
+                all_dates = np.concatenate(all_dates)
+                min_date = pd.Timestamp(all_dates.min()).date()
+                max_date = pd.Timestamp(all_dates.max()).date()
+                filters = setup_filters(all_tickers, min_date, max_date)
+                results = filter_results(indexes, **filters)
+                date_filtered = (filters["start_date"], filters["end_date"]) != (min_date, max_date)
+
+            # 4. Tính toán Win Rate trên tập đã lọc
+            # Không lọc hoặc chỉ lọc theo mã -> cộng các ô của cube; lọc khác -> tính trên tập đã lọc
+            if date_filtered or filters.get("rating") is not None or filters.get("min_alpha") is not None:
+                summary_df = calculate_win_rate_summary(results)
+            else:
+                summary_df = cube.win_rate_summary({"Cổ phiếu": filters["tickers"]} if filters.get("tickers") else None)
+
+            # 5. Hiển thị kết quả
             display_results(results, summary_df, period_label)
+            display_cube_explorer(cube)
+
+            # 6. Backtest danh mục: chỉ áp dụng bộ lọc mã và ngày. Bộ lọc rating / Alpha dựa trên
+            # lợi nhuận sau sự kiện nên nếu áp dụng sẽ chỉ giao dịch các khuyến nghị đã đúng (look-ahead)
+            if backtest_options is not None:
+                backtest_results = analysis["results"]
+                if filters:
+                    backtest_results = filter_results(indexes, tickers=filters["tickers"],
+                                                      start_date=filters["start_date"], end_date=filters["end_date"])
+                nav_df, stats = run_backtest(
+                    backtest_results,
+                    analysis["prices_pivot"],
+                    backtest_options["signals"],
+                    holding_offset=None if backtest_options["hold_until_change"] else period_offset,
+                    history=analysis["history"],
+                    weights=backtest_options["weights"]
+                )
+                display_backtest(nav_df, stats, filters.get("rating") is not None or filters.get("min_alpha") is not None)
 
         except Exception as e:
             st.error(f"Một lỗi không mong muốn đã xảy ra: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
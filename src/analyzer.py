@@ -1,9 +1,11 @@
 # src/analyzer.py
+import numpy as np
 import pandas as pd
 from pandas.tseries.offsets import DateOffset
 import streamlit as st
 from typing import Tuple, Dict, Any
 from config import VNINDEX_TICKER
+from src.rating_history import RatingHistory
 
 def add_performance_cols(df: pd.DataFrame, prices_pivot: pd.DataFrame, date_col_name: str, period_offset: DateOffset, period_label: str) -> pd.DataFrame:
     """
@@ -78,46 +80,52 @@ def add_performance_cols(df: pd.DataFrame, prices_pivot: pd.DataFrame, date_col_
     df['Rating'] = ratings
     return df
 
+def prepare_price_pivot(df_price: pd.DataFrame) -> pd.DataFrame:
+    """
+    Làm sạch dữ liệu giá và pivot thành ma trận ngày × mã.
+    """
+    if df_price.empty:
+        return pd.DataFrame()
+    df_price['Date'] = pd.to_datetime(df_price['Date'], errors='coerce')
+    df_price.dropna(subset=['Date'], inplace=True)
+    prices_pivot = df_price.pivot_table(index='Date', columns='Stock', values='Price', aggfunc='first')
+    prices_pivot.sort_index(inplace=True)
+    return prices_pivot
+
 def process_stock_data(df_rec: pd.DataFrame, df_price: pd.DataFrame, period_offset: DateOffset, period_label: str) -> Tuple[pd.DataFrame, ...]:
     """
     Xử lý, làm sạch và phân tích dữ liệu cổ phiếu.
     """
-    # 1. Làm sạch dữ liệu khuyến nghị
-    df_rec.dropna(axis=1, how='all', inplace=True)
-    df_rec = df_rec.loc[:, ~df_rec.columns.str.contains('^Unnamed')]
-    df_rec.index = pd.to_datetime(df_rec.index, errors='coerce')
-    df_rec.dropna(axis=0, how='all', inplace=True)
-    df_rec = df_rec[df_rec.index.notna()]
-    df_rec.sort_index(inplace=True)
-
-    if df_rec.empty:
+    # 1. Dựng lịch sử khuyến nghị dạng nén (chỉ các ô có dữ liệu, rating mã hóa int8)
+    history = RatingHistory.from_sheet(df_rec)
+
+    if history.empty:
         st.warning("Không tìm thấy dữ liệu ngày tháng hợp lệ trong sheet khuyến nghị.")
         return tuple(pd.DataFrame() for _ in range(4))
     
     # 2. Chuẩn bị dữ liệu giá
-    prices_pivot = pd.DataFrame()
-    if not df_price.empty:
-        df_price['Date'] = pd.to_datetime(df_price['Date'], errors='coerce')
-        df_price.dropna(subset=['Date'], inplace=True)
-        prices_pivot = df_price.pivot_table(index='Date', columns='Stock', values='Price', aggfunc='first')
-        prices_pivot.sort_index(inplace=True)
-
-    # 3. Phân tích sự thay đổi trạng thái
-    df_filled = df_rec.ffill()
-    df_shifted = df_filled.shift(1)
-
-    cond1 = (df_filled == 'MARKET-PERFORM') & (df_shifted == 'OUTPERFORM')
-    cond2 = (df_filled == 'OUTPERFORM') & (df_shifted == 'MARKET-PERFORM')
-
-    list1_data = [{'Cổ phiếu': stock, 'Ngày thay đổi': date} for stock in cond1.columns for date in cond1.index[cond1[stock]]]
-    list2_data = [{'Cổ phiếu': stock, 'Ngày thay đổi': date} for stock in cond2.columns for date in cond2.index[cond2[stock]]]
-    buy_data = [{'Cổ phiếu': stock, 'Ngày khuyến nghị': date} for stock in df_rec.columns for date in df_rec.index[df_rec[stock] == 'BUY']]
-    under_data = [{'Cổ phiếu': stock, 'Ngày khuyến nghị': date} for stock in df_rec.columns for date in df_rec.index[df_rec[stock] == 'UNDER-PERFORM']]
-
-    df_list1 = pd.DataFrame(list1_data).sort_values(by='Ngày thay đổi', ascending=False)
-    df_list2 = pd.DataFrame(list2_data).sort_values(by='Ngày thay đổi', ascending=False)
-    df_list3 = pd.DataFrame(buy_data).sort_values(by='Ngày khuyến nghị', ascending=False)
-    df_list4 = pd.DataFrame(under_data).sort_values(by='Ngày khuyến nghị', ascending=False)
+    prices_pivot = prepare_price_pivot(df_price)
+
+    return process_history(history, prices_pivot, period_offset, period_label)
+
+def process_history(history: RatingHistory, prices_pivot: pd.DataFrame, period_offset: DateOffset, period_label: str) -> Tuple[pd.DataFrame, ...]:
+    """
+    Phân tích trên lịch sử khuyến nghị và ma trận giá đã dựng sẵn (vd: từ bộ làm mới nền).
+
+    Args:
+        history (RatingHistory): Lịch sử khuyến nghị dạng nén.
+        prices_pivot (pd.DataFrame): Ma trận giá ngày × mã.
+        period_offset (DateOffset): Khoảng thời gian để tính hiệu suất.
+        period_label (str): Nhãn cho khoảng thời gian (vd: '6T').
+
+    Returns:
+        Tuple[pd.DataFrame, ...]: 4 bảng kết quả (Out→MP, MP→Out, BUY, UNDER-PERFORM).
+    """
+    # 3. Phân tích sự thay đổi trạng thái trên các điểm thay đổi rating
+    df_list1 = history.transitions('OUTPERFORM', 'MARKET-PERFORM', 'Ngày thay đổi').sort_values(by='Ngày thay đổi', ascending=False)
+    df_list2 = history.transitions('MARKET-PERFORM', 'OUTPERFORM', 'Ngày thay đổi').sort_values(by='Ngày thay đổi', ascending=False)
+    df_list3 = history.point_ratings('BUY', 'Ngày khuyến nghị').sort_values(by='Ngày khuyến nghị', ascending=False)
+    df_list4 = history.point_ratings('UNDER-PERFORM', 'Ngày khuyến nghị').sort_values(by='Ngày khuyến nghị', ascending=False)
 
     # **THAY ĐỔI MỚI: ĐỊNH DẠNG LẠI CỘT NGÀY**
     if not df_list1.empty:
@@ -138,17 +146,33 @@ def process_stock_data(df_rec: pd.DataFrame, df_price: pd.DataFrame, period_offs
 
     return df_list1, df_list2, df_list3, df_list4
 
-def _parse_percentage(val: str) -> float:
+# Tên hiển thị ngắn gọn hơn cho từng bảng kết quả
+DISPLAY_NAMES = {
+    'Out_sang_MarketPerform': 'Out → MP',
+    'MarketPerform_sang_Out': 'MP → Out', 
+    'Khuyen_nghi_BUY': 'BUY',
+    'Khuyen_nghi_UnderPerform': 'UNDER'
+}
+
+def target_rating_for(name: str) -> str:
     """
-    Parse giá trị phần trăm từ string sang float.
-    Ví dụ: "-3.25%" -> -0.0325, "5.80%" -> 0.058
+    Rating được tính là "thắng" cho từng loại khuyến nghị.
     """
-    try:
-        if isinstance(val, str) and '%' in val:
-            return float(val.replace('%', '').strip()) / 100
-        return float('nan')
-    except (ValueError, TypeError):
-        return float('nan')
+    return 'Underperform' if name in ['Out_sang_MarketPerform', 'Khuyen_nghi_UnderPerform'] else 'Outperform'
+
+def parse_percentages(values: pd.Series) -> np.ndarray:
+    """
+    Parse cột phần trăm dạng string (vd: cột vs VNINDEX) sang mảng float.
+    Ví dụ: "-3.25%" -> -0.0325, "5.80%" -> 0.058; giá trị không phải string có '%' (vd: 'N/A') -> NaN.
+    Dùng chung cho bảng Win Rate, cube tổng hợp và bộ lọc Alpha để các kết quả luôn khớp nhau.
+    """
+    values = pd.Series(values, dtype=object)
+    is_pct = values.map(lambda val: isinstance(val, str) and '%' in val).to_numpy(dtype=bool)
+    parsed = np.full(len(values), np.nan)
+    if is_pct.any():
+        numbers = values[is_pct].str.replace('%', '', regex=False).str.strip()
+        parsed[is_pct] = pd.to_numeric(numbers, errors='coerce').to_numpy(dtype=np.float64) / 100
+    return parsed
 
 
 def calculate_win_rate_summary(data_dict: Dict[str, pd.DataFrame]) -> pd.DataFrame:
@@ -165,14 +189,6 @@ def calculate_win_rate_summary(data_dict: Dict[str, pd.DataFrame]) -> pd.DataFra
     all_years = set()
     dfs_copy = {}
     
-    # Tên hiển thị ngắn gọn hơn
-    display_names = {
-        'Out_sang_MarketPerform': 'Out → MP',
-        'MarketPerform_sang_Out': 'MP → Out', 
-        'Khuyen_nghi_BUY': 'BUY',
-        'Khuyen_nghi_UnderPerform': 'UNDER'
-    }
-    
     # Chuẩn bị dữ liệu và thu thập tất cả các năm có dữ liệu
     for name, df in data_dict.items():
         df_copy = df.copy()
@@ -191,7 +207,7 @@ def calculate_win_rate_summary(data_dict: Dict[str, pd.DataFrame]) -> pd.DataFra
     summary_data = {}
 
     for name, (df, date_col) in dfs_copy.items():
-        display_name = display_names.get(name, name)
+        display_name = DISPLAY_NAMES.get(name, name)
         win_rates = []
         alphas = []
         
@@ -203,10 +219,10 @@ def calculate_win_rate_summary(data_dict: Dict[str, pd.DataFrame]) -> pd.DataFra
             
             # Parse giá trị Alpha từ string sang số
             if vs_vnindex_col:
-                df_filtered['Alpha_Numeric'] = df_filtered[vs_vnindex_col].apply(_parse_percentage)
+                df_filtered['Alpha_Numeric'] = parse_percentages(df_filtered[vs_vnindex_col])
 
             # Xác định target rating
-            target_rating = 'Underperform' if name in ['Out_sang_MarketPerform', 'Khuyen_nghi_UnderPerform'] else 'Outperform'
+            target_rating = target_rating_for(name)
 
             for year in years:
                 year_df = df_filtered[df_filtered['Year'] == year]
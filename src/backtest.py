@@ -0,0 +1,165 @@
+# src/backtest.py
+import numpy as np
+import pandas as pd
+from pandas.tseries.offsets import DateOffset
+from typing import Dict, List, Optional, Tuple
+from config import VNINDEX_TICKER
+from src.rating_history import RatingHistory
+
+# Chiều vị thế cho từng loại tín hiệu: +1 = mua, -1 = bán khống
+SIGNAL_SIDES = {
+    'Out_sang_MarketPerform': -1,
+    'MarketPerform_sang_Out': 1,
+    'Khuyen_nghi_BUY': 1,
+    'Khuyen_nghi_UnderPerform': -1
+}
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def _collect_events(results: Dict[str, pd.DataFrame], signals: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Gom các sự kiện của những bảng được chọn thành mảng (mã, ngày, chiều vị thế).
+    """
+    tickers, dates, sides = [], [], []
+    for name in signals:
+        df = results.get(name, pd.DataFrame())
+        date_col = next((col for col in df.columns if 'Ngày' in col), None)
+        if df.empty or date_col is None:
+            continue
+        tickers.append(df['Cổ phiếu'].astype(str).to_numpy())
+        dates.append(pd.to_datetime(df[date_col]).to_numpy(dtype='datetime64[ns]'))
+        sides.append(np.full(len(df), SIGNAL_SIDES.get(name, 1), dtype=np.float64))
+
+    if not tickers:
+        return np.array([], dtype=object), np.array([], dtype='datetime64[ns]'), np.array([], dtype=np.float64)
+    return np.concatenate(tickers), np.concatenate(dates), np.concatenate(sides)
+
+
+def _max_drawdown(nav: np.ndarray) -> float:
+    if len(nav) == 0:
+        return float('nan')
+    return float((nav / np.maximum.accumulate(nav) - 1).min())
+
+
+def run_backtest(results: Dict[str, pd.DataFrame],
+                 prices_pivot: pd.DataFrame,
+                 signals: List[str],
+                 holding_offset: Optional[DateOffset] = None,
+                 history: Optional[RatingHistory] = None,
+                 weights: Optional[Dict[str, float]] = None) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    """
+    Backtest danh mục từ các tín hiệu khuyến nghị, tính toán dạng ma trận trên lưới ngày × mã.
+
+    Mỗi sự kiện mở vị thế từ phiên giao dịch đầu tiên >= ngày khuyến nghị và giữ đến
+    ngày + holding_offset, hoặc đến lần đổi rating kế tiếp nếu holding_offset là None.
+    Số sự kiện đang mở trên mỗi mã được đếm qua mảng sai phân (np.add.at + cumsum); mỗi mã
+    chỉ giữ một vị thế với tỷ trọng của mã, theo chiều của số sự kiện đang mở, nên các sự
+    kiện chồng nhau (vd: BUY được nhắc lại nhiều lần) không làm tăng tỷ trọng. Sau đó chuẩn
+    hóa theo tổng tỷ trọng tuyệt đối mỗi ngày (tái cân bằng hằng ngày).
+
+    Args:
+        results (Dict[str, pd.DataFrame]): Các bảng kết quả từ process_stock_data.
+        prices_pivot (pd.DataFrame): Ma trận giá ngày × mã (có cột VNINDEX_TICKER).
+        signals (List[str]): Tên các bảng dùng làm tín hiệu (key của SIGNAL_SIDES).
+        holding_offset (Optional[DateOffset]): Thời gian nắm giữ cố định.
+        history (Optional[RatingHistory]): Bắt buộc khi giữ đến lần đổi rating kế tiếp.
+        weights (Optional[Dict[str, float]]): Tỷ trọng tùy chỉnh theo mã. None = tỷ trọng đều;
+            mã không có trong từ điển được gán tỷ trọng 0.
+
+    Returns:
+        Tuple[pd.DataFrame, Dict[str, float]]: Chuỗi NAV/turnover theo ngày và bảng chỉ số tổng hợp.
+    """
+    if prices_pivot.empty or VNINDEX_TICKER not in prices_pivot.columns:
+        raise ValueError(f"Không có dữ liệu giá hoặc thiếu mã {VNINDEX_TICKER} để backtest.")
+    if holding_offset is None and history is None:
+        raise ValueError("Cần lịch sử rating để nắm giữ đến lần đổi rating kế tiếp.")
+
+    dates = prices_pivot.index.to_numpy(dtype='datetime64[ns]')
+    stock_cols = prices_pivot.columns[prices_pivot.columns != VNINDEX_TICKER]
+    prices = prices_pivot[stock_cols].ffill().to_numpy(dtype=np.float64)
+    bench = prices_pivot[VNINDEX_TICKER].ffill().to_numpy(dtype=np.float64)
+    n_days, n_stocks = prices.shape
+
+    # Lợi nhuận ngày; ngày chưa có giá được coi là 0 và không được phép giữ vị thế
+    returns = np.zeros_like(prices)
+    returns[1:] = prices[1:] / prices[:-1] - 1
+    returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+    bench_returns = np.zeros(n_days)
+    bench_returns[1:] = np.nan_to_num(bench[1:] / bench[:-1] - 1, nan=0.0, posinf=0.0, neginf=0.0)
+    available = ~np.isnan(prices)
+
+    # --- Sự kiện -> chỉ số (ngày vào, ngày ra, cột) ---
+    tickers, event_dates, sides = _collect_events(results, signals)
+    cols = stock_cols.get_indexer(tickers) if len(tickers) else np.array([], dtype=np.int64)
+    keep = cols >= 0
+    tickers, event_dates, sides, cols = tickers[keep], event_dates[keep], sides[keep], cols[keep]
+
+    if holding_offset is not None:
+        exit_dates = (pd.DatetimeIndex(event_dates) + holding_offset).to_numpy(dtype='datetime64[ns]')
+    else:
+        exit_dates = history.next_change_dates(tickers, event_dates)
+
+    entry = np.searchsorted(dates, event_dates, side='left')
+    exit_ = np.where(np.isnat(exit_dates), n_days - 1, np.searchsorted(dates, exit_dates, side='right') - 1)
+    valid = (entry < n_days) & (exit_ > entry)
+    entry, exit_, cols, sides = entry[valid], exit_[valid], cols[valid], sides[valid]
+
+    ticker_weights = np.ones(n_stocks)
+    if weights:
+        ticker_weights = np.array([weights.get(str(t), 0.0) for t in stock_cols], dtype=np.float64)
+
+    # --- Vị thế theo ngày: đếm số sự kiện đang mở bằng mảng sai phân ---
+    # Vị thế hưởng lợi nhuận từ phiên entry + 1 đến hết phiên exit
+    deltas = np.zeros((n_days + 1, n_stocks))
+    np.add.at(deltas, (entry + 1, cols), sides)
+    np.add.at(deltas, (exit_ + 1, cols), -sides)
+    open_events = np.cumsum(deltas[:-1], axis=0)
+    # Một vị thế cho mỗi mã: chiều theo số sự kiện đang mở, tỷ trọng là tỷ trọng của mã
+    exposure = np.sign(open_events) * ticker_weights * available
+
+    gross = np.abs(exposure).sum(axis=1)
+    position_weights = np.divide(exposure, gross[:, None], out=np.zeros_like(exposure), where=gross[:, None] > 0)
+
+    port_returns = (position_weights * returns).sum(axis=1)
+    turnover = np.zeros(n_days)
+    turnover[1:] = 0.5 * np.abs(np.diff(position_weights, axis=0)).sum(axis=1)
+    n_positions = (exposure != 0).sum(axis=1)
+
+    # Bắt đầu từ ngày đầu tiên có vị thế
+    active = np.flatnonzero(gross > 0)
+    start = max(active[0] - 1, 0) if len(active) else n_days
+    port_returns, bench_returns = port_returns[start:], bench_returns[start:]
+    turnover, n_positions = turnover[start:], n_positions[start:]
+    bench_returns = bench_returns.copy()
+    if len(bench_returns):
+        bench_returns[0] = 0.0
+
+    nav = np.cumprod(1 + port_returns)
+    bench_nav = np.cumprod(1 + bench_returns)
+    excess_nav = np.cumprod(1 + port_returns - bench_returns)
+
+    nav_df = pd.DataFrame({
+        'NAV': nav,
+        'NAV VNINDEX': bench_nav,
+        'Excess NAV': excess_nav,
+        'Turnover': turnover,
+        'Số vị thế': n_positions
+    }, index=prices_pivot.index[start:])
+
+    years = len(nav) / TRADING_DAYS_PER_YEAR
+    excess_returns = port_returns - bench_returns
+    vol = float(np.std(port_returns) * np.sqrt(TRADING_DAYS_PER_YEAR)) if len(nav) else float('nan')
+    stats = {
+        'Số sự kiện': int(len(entry)),
+        'Lợi nhuận tích lũy': float(nav[-1] - 1) if len(nav) else float('nan'),
+        'Lợi nhuận VNINDEX': float(bench_nav[-1] - 1) if len(nav) else float('nan'),
+        'Lợi nhuận năm hóa': float(nav[-1] ** (1 / years) - 1) if years > 0 else float('nan'),
+        'Excess năm hóa': float(excess_nav[-1] ** (1 / years) - 1) if years > 0 else float('nan'),
+        'Biến động năm hóa': vol,
+        'Sharpe': float(np.mean(port_returns) * TRADING_DAYS_PER_YEAR / vol) if vol > 0 else float('nan'),
+        'Tracking error': float(np.std(excess_returns) * np.sqrt(TRADING_DAYS_PER_YEAR)) if len(nav) else float('nan'),
+        'Max drawdown': _max_drawdown(nav),
+        'Turnover TB/ngày': float(turnover.mean()) if len(nav) else float('nan')
+    }
+    return nav_df, stats
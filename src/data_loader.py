@@ -1,7 +1,6 @@
 # src/data_loader.py
 import pandas as pd
 import re
-import streamlit as st
 from typing import Tuple, Optional
 
 def convert_gdrive_link(gdrive_url: str) -> Optional[str]:
@@ -28,38 +27,34 @@ def convert_gdrive_link(gdrive_url: str) -> Optional[str]:
         
     return None
 
-@st.cache_data
-def load_data_from_gdrive(gdrive_url: str, rec_sheet: str, price_sheet: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+def fetch_workbook(gdrive_url: str, rec_sheet: str, price_sheet: Optional[str]) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Tải dữ liệu từ file Excel trên Google Drive.
+    Hàm chạy trong thread làm mới nền (src.refresher), ngoài phiên Streamlit, nên không
+    gọi st.*; lỗi được raise để hiển thị ở phiên đang chờ.
 
     Args:
         gdrive_url (str): Link Google Drive đã được hardcode.
         rec_sheet (str): Tên sheet chứa dữ liệu khuyến nghị.
-        price_sheet (str): Tên sheet chứa dữ liệu giá.
+        price_sheet (Optional[str]): Tên sheet chứa dữ liệu giá. None để bỏ qua sheet giá
+            (vd: khi đã có snapshot ma trận giá), khi đó DataFrame giá trả về rỗng.
 
     Returns:
         Tuple[pd.DataFrame, pd.DataFrame]: Hai DataFrame chứa dữ liệu khuyến nghị và giá.
-    
+
     Raises:
+        ValueError: Nếu link Google Drive không hợp lệ.
         FileNotFoundError: Nếu không tìm thấy các sheet cần thiết trong file Excel.
-        Exception: Cho các lỗi khác khi tải hoặc đọc file.
     """
     download_url = convert_gdrive_link(gdrive_url)
     if not download_url:
         raise ValueError("Link Google Drive không hợp lệ. Vui lòng kiểm tra lại link trong file config.py.")
 
-    try:
-        xls = pd.ExcelFile(download_url, engine='openpyxl')
-        
-        if rec_sheet not in xls.sheet_names or price_sheet not in xls.sheet_names:
-            raise FileNotFoundError(f"Lỗi: File Excel phải chứa cả hai sheet tên là '{rec_sheet}' và '{price_sheet}'.")
-        
-        df_rec = pd.read_excel(xls, sheet_name=rec_sheet, header=1, index_col=0)
-        df_price = pd.read_excel(xls, sheet_name=price_sheet)
-        
-        return df_rec, df_price
-    except Exception as e:
-        st.error(f"Đã xảy ra lỗi khi tải hoặc xử lý file: {e}")
-        st.error("Vui lòng đảm bảo link của bạn được chia sẻ ở chế độ 'Bất kỳ ai có đường liên kết'.")
-        return pd.DataFrame(), pd.DataFrame()
\ No newline at end of file
+    xls = pd.ExcelFile(download_url, engine='openpyxl')
+
+    if rec_sheet not in xls.sheet_names or (price_sheet is not None and price_sheet not in xls.sheet_names):
+        raise FileNotFoundError(f"Lỗi: File Excel phải chứa cả hai sheet tên là '{rec_sheet}' và '{price_sheet}'.")
+
+    df_rec = pd.read_excel(xls, sheet_name=rec_sheet, header=1, index_col=0)
+    df_price = pd.read_excel(xls, sheet_name=price_sheet) if price_sheet is not None else pd.DataFrame()
+    return df_rec, df_price
\ No newline at end of file
@@ -0,0 +1,143 @@
+# src/event_index.py
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Sequence, Tuple, Any
+from src.analyzer import parse_percentages
+
+# Mã hóa rating thành số nguyên nhỏ để lọc bằng phép so sánh mảng
+RATING_CATEGORIES = ['Outperform', 'Underperform', 'N/A']
+
+
+class EventIndex:
+    """
+    Chỉ mục dựng sẵn trên một bảng sự kiện (kết quả của process_stock_data).
+
+    - Bảng được sắp xếp theo (Cổ phiếu, Ngày) và mỗi mã được ánh xạ tới một khoảng dòng [start, end).
+    - Một mảng vị trí sắp xếp theo ngày để cắt theo khoảng thời gian bằng searchsorted.
+    - Rating được mã hóa dạng categorical (int8) và Alpha được parse sẵn sang float.
+
+    Mỗi lần lọc chỉ là vài phép cắt mảng numpy, không cần chạy lại phân tích.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.date_col = next((col for col in df.columns if 'Ngày' in col), None)
+        n = len(df)
+
+        if n == 0 or self.date_col is None or 'Cổ phiếu' not in df.columns:
+            self.tickers = np.array([], dtype=object)
+            self.dates = np.array([], dtype='datetime64[ns]')
+            self.row_pos = np.array([], dtype=np.int64)
+            self.ticker_ranges: Dict[str, Tuple[int, int]] = {}
+            self.date_order = np.array([], dtype=np.int64)
+            self.sorted_dates = self.dates
+            self.rating_codes = np.array([], dtype=np.int8)
+            self.alpha = np.array([], dtype=np.float64)
+            return
+
+        dates = pd.to_datetime(df[self.date_col]).to_numpy(dtype='datetime64[ns]')
+        tickers = df['Cổ phiếu'].astype(str).to_numpy()
+
+        # Sắp xếp theo (Cổ phiếu, Ngày); row_pos giữ vị trí dòng trong bảng gốc
+        order = np.lexsort((dates, tickers))
+        self.row_pos = order.astype(np.int64)
+        self.tickers = tickers[order]
+        self.dates = dates[order]
+
+        # Ánh xạ mã -> khoảng dòng trên bảng đã sắp xếp
+        uniques, starts = np.unique(self.tickers, return_index=True)
+        ends = np.append(starts[1:], n)
+        self.ticker_ranges = {t: (int(s), int(e)) for t, s, e in zip(uniques, starts, ends)}
+
+        # Chỉ mục vị trí theo ngày
+        self.date_order = np.argsort(self.dates, kind='stable')
+        self.sorted_dates = self.dates[self.date_order]
+
+        if 'Rating' in df.columns:
+            ratings = pd.Categorical(df['Rating'].to_numpy()[order], categories=RATING_CATEGORIES)
+            self.rating_codes = ratings.codes.astype(np.int8)
+        else:
+            self.rating_codes = np.full(n, -1, dtype=np.int8)
+
+        vs_col = next((col for col in df.columns if 'vs VNINDEX' in col), None)
+        if vs_col:
+            self.alpha = parse_percentages(df[vs_col])[order]
+        else:
+            self.alpha = np.full(n, np.nan)
+
+    def __len__(self) -> int:
+        return len(self.row_pos)
+
+    def select(self,
+               tickers: Optional[Sequence[str]] = None,
+               start_date: Optional[Any] = None,
+               end_date: Optional[Any] = None,
+               rating: Optional[str] = None,
+               min_alpha: Optional[float] = None) -> np.ndarray:
+        """
+        Trả về vị trí (theo bảng gốc) của các dòng thỏa điều kiện lọc, giữ nguyên thứ tự gốc.
+
+        Args:
+            tickers (Optional[Sequence[str]]): Danh sách mã cần giữ. None hoặc rỗng = tất cả.
+            start_date, end_date: Khoảng ngày (bao gồm hai đầu). None = không giới hạn.
+            rating (Optional[str]): 'Outperform', 'Underperform' hoặc 'N/A'. None = tất cả.
+            min_alpha (Optional[float]): Ngưỡng Alpha tối thiểu (vd: 0.05 cho +5%).
+
+        Returns:
+            np.ndarray: Vị trí dòng trong DataFrame gốc.
+        """
+        n = len(self.row_pos)
+        if n == 0:
+            return self.row_pos
+
+        # Bước 1: thu hẹp ứng viên bằng chỉ mục mã hoặc chỉ mục ngày
+        if tickers:
+            ranges = [self.ticker_ranges[t] for t in tickers if t in self.ticker_ranges]
+            if not ranges:
+                return np.array([], dtype=np.int64)
+            cand = np.concatenate([np.arange(s, e) for s, e in ranges])
+            if start_date is not None or end_date is not None:
+                d = self.dates[cand]
+                keep = np.ones(len(cand), dtype=bool)
+                if start_date is not None:
+                    keep &= d >= np.datetime64(pd.Timestamp(start_date), 'ns')
+                if end_date is not None:
+                    keep &= d <= np.datetime64(pd.Timestamp(end_date), 'ns')
+                cand = cand[keep]
+        elif start_date is not None or end_date is not None:
+            lo = 0 if start_date is None else np.searchsorted(
+                self.sorted_dates, np.datetime64(pd.Timestamp(start_date), 'ns'), side='left')
+            hi = n if end_date is None else np.searchsorted(
+                self.sorted_dates, np.datetime64(pd.Timestamp(end_date), 'ns'), side='right')
+            cand = self.date_order[lo:hi]
+        else:
+            cand = np.arange(n)
+
+        # Bước 2: lọc theo rating và alpha trên tập ứng viên
+        if rating is not None and rating in RATING_CATEGORIES:
+            cand = cand[self.rating_codes[cand] == RATING_CATEGORIES.index(rating)]
+        if min_alpha is not None:
+            alpha = self.alpha[cand]
+            cand = cand[~np.isnan(alpha) & (alpha >= min_alpha)]
+
+        return np.sort(self.row_pos[cand])
+
+    def filter(self, **kwargs) -> pd.DataFrame:
+        """
+        Trả về DataFrame con đã lọc (xem select để biết các tham số).
+        """
+        return self.df.iloc[self.select(**kwargs)]
+
+
+def build_event_indexes(results: Dict[str, pd.DataFrame]) -> Dict[str, EventIndex]:
+    """
+    Dựng chỉ mục cho tất cả các bảng kết quả.
+    """
+    return {name: EventIndex(df) for name, df in results.items()}
+
+
+def filter_results(indexes: Dict[str, EventIndex], **kwargs) -> Dict[str, pd.DataFrame]:
+    """
+    Áp dụng cùng một bộ lọc cho tất cả các bảng kết quả.
+    """
+    return {name: index.filter(**kwargs) for name, index in indexes.items()}
@@ -0,0 +1,187 @@
+# src/pipeline.py
+import datetime
+import hashlib
+import os
+import pickle
+import tempfile
+import pandas as pd
+from pandas.tseries.offsets import DateOffset
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import PRICE_SNAPSHOT_DIR, PRICE_SNAPSHOT_MAX_AGE, SECTOR_MAPPING
+from src.data_loader import fetch_workbook
+from src.analyzer import process_history
+from src.event_index import build_event_indexes
+from src.rating_history import RatingHistory
+from src.price_store import source_key, price_fingerprint, latest_price_snapshot, open_price_snapshot, load_price_matrix, snapshot_created_at
+from src.win_rate_cube import WinRateCube
+
+# Tăng khi thay đổi cấu trúc file dataset đã lưu. Khi code phân tích thay đổi thì không cần:
+# bản khôi phục từ đĩa luôn được dựng lại ở lần làm mới đầu tiên (DataSnapshot.verified)
+DATASET_FORMAT_VERSION = 1
+
+
+def _frame_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Hash nội dung (kể cả index và tên cột) để nhận biết sheet khuyến nghị có thay đổi hay không.
+    """
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    digest.update('|'.join(str(col) for col in df.columns).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def build_analysis(history: RatingHistory, prices_pivot: pd.DataFrame, period_offset: DateOffset, period_label: str) -> Dict[str, Any]:
+    """
+    Chạy phân tích cho một khoảng thời gian và dựng chỉ mục / cube cho các bảng kết quả.
+    Các DataFrame trả về được dùng chung giữa các phiên, không được sửa trực tiếp.
+    """
+    df1, df2, df3, df4 = process_history(history, prices_pivot, period_offset, period_label)
+
+    results = {
+        "Out_sang_MarketPerform": df1,
+        "MarketPerform_sang_Out": df2,
+        "Khuyen_nghi_BUY": df3,
+        "Khuyen_nghi_UnderPerform": df4
+    }
+    return _index_results(results, history, prices_pivot)
+
+
+def _index_results(results: Dict[str, pd.DataFrame], history: RatingHistory, prices_pivot: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Dựng chỉ mục lọc và cube tổng hợp cho các bảng kết quả của một khoảng thời gian.
+    """
+    return {
+        "results": results,
+        "indexes": build_event_indexes(results),
+        "cube": WinRateCube.from_results(results, SECTOR_MAPPING),
+        "history": history,
+        "prices_pivot": prices_pivot
+    }
+
+
+def build_dataset(gdrive_url: str, rec_sheet: str, price_sheet: str,
+                  periods: Iterable[Tuple[DateOffset, str]],
+                  previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Tải workbook, làm sạch dữ liệu và tính sẵn kết quả cho mọi khoảng thời gian.
+    Dùng làm hàm build cho src.refresher.BackgroundRefresher.
+
+    Lần dựng đầu tiên của process mmap snapshot giá còn mới (nếu có) thay vì đọc lại
+    sheet giá; các lần sau luôn đọc đủ cả hai sheet để phát hiện thay đổi.
+
+    Args:
+        periods: Các cặp (DateOffset, nhãn) cần tính sẵn.
+        previous (Optional[Dict[str, Any]]): Dataset trước đó. Nếu nguồn không đổi thì trả
+            về chính đối tượng này (không tính lại).
+
+    Returns:
+        Dict[str, Any]: {'version', 'history', 'prices_pivot', 'analyses': {nhãn: analysis}}.
+
+    Raises:
+        ValueError: Nếu không tải được dữ liệu hợp lệ.
+    """
+    source_dir = os.path.join(PRICE_SNAPSHOT_DIR, source_key(gdrive_url, price_sheet))
+    snapshot_dir = latest_price_snapshot(source_dir, PRICE_SNAPSHOT_MAX_AGE) if previous is None else None
+
+    df_rec, df_price = fetch_workbook(gdrive_url, rec_sheet, None if snapshot_dir else price_sheet)
+    if df_rec.empty or (snapshot_dir is None and df_price.empty):
+        raise ValueError("Không thể tải dữ liệu hoặc file không hợp lệ. Vui lòng kiểm tra lại link và định dạng file.")
+
+    version = (_frame_fingerprint(df_rec), os.path.basename(snapshot_dir) if snapshot_dir else price_fingerprint(df_price))
+    if previous is not None and previous["version"] == version:
+        return previous
+
+    history = RatingHistory.from_sheet(df_rec)
+    if history.empty:
+        raise ValueError("Không tìm thấy dữ liệu ngày tháng hợp lệ trong sheet khuyến nghị.")
+
+    prices_pivot = open_price_snapshot(snapshot_dir) if snapshot_dir else load_price_matrix(df_price, source_dir)
+    analyses = {label: build_analysis(history, prices_pivot, offset, label) for offset, label in periods}
+
+    return {
+        "version": version,
+        "history": history,
+        "prices_pivot": prices_pivot,
+        "analyses": analyses
+    }
+
+
+def dataset_path(gdrive_url: str, rec_sheet: str, price_sheet: str) -> str:
+    """
+    Đường dẫn file lưu dataset đã xử lý, nằm cạnh các snapshot giá của cùng nguồn.
+    """
+    rec_key = hashlib.sha1(rec_sheet.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(PRICE_SNAPSHOT_DIR, source_key(gdrive_url, price_sheet), f'dataset-{rec_key}.pkl')
+
+
+def save_dataset(path: str, dataset: Dict[str, Any], as_of: datetime.datetime, built_at: datetime.datetime) -> bool:
+    """
+    Lưu dataset (lịch sử rating và các bảng kết quả) để process khởi động lại phục vụ ngay,
+    không phải chờ tải và tính lại. Ma trận giá không được lưu lại mà trỏ tới snapshot giá
+    cùng phiên bản; chỉ mục và cube được dựng lại khi đọc.
+
+    Returns:
+        bool: False nếu không lưu (ma trận giá không có snapshot trên đĩa, hoặc lỗi ghi file).
+    """
+    source_dir = os.path.dirname(path)
+    if snapshot_created_at(os.path.join(source_dir, dataset["version"][1])) is None:
+        return False
+
+    payload = {
+        "format": DATASET_FORMAT_VERSION,
+        "version": dataset["version"],
+        "history": dataset["history"],
+        "results": {label: analysis["results"] for label, analysis in dataset["analyses"].items()},
+        "as_of": as_of,
+        "built_at": built_at
+    }
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix='.dataset-', dir=source_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        return False
+    return True
+
+
+def load_dataset(path: str, period_labels: List[str]) -> Optional[Tuple[Dict[str, Any], datetime.datetime, datetime.datetime]]:
+    """
+    Đọc dataset đã lưu bởi save_dataset.
+
+    Mọi lỗi khi đọc hoặc kiểm tra file (kể cả lỗi unpickle sau khi nâng cấp pandas / numpy)
+    được coi như chưa có bản lưu, để process vẫn khởi động và dựng lại từ nguồn.
+
+    Returns:
+        Optional[Tuple[Dict[str, Any], datetime.datetime, datetime.datetime]]: (dataset, as_of,
+        built_at), hoặc None nếu chưa có, khác định dạng / khoảng thời gian, snapshot giá
+        tương ứng đã bị xóa, hoặc không đọc được.
+    """
+    try:
+        return _read_dataset(path, period_labels)
+    except Exception:
+        return None
+
+
+def _read_dataset(path: str, period_labels: List[str]) -> Optional[Tuple[Dict[str, Any], datetime.datetime, datetime.datetime]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        payload = pickle.load(f)
+    if not isinstance(payload, dict) or payload.get("format") != DATASET_FORMAT_VERSION \
+            or sorted(payload.get("results", {})) != sorted(period_labels):
+        return None
+
+    prices_pivot = open_price_snapshot(os.path.join(os.path.dirname(path), payload["version"][1]))
+    history = payload["history"]
+    dataset = {
+        "version": payload["version"],
+        "history": history,
+        "prices_pivot": prices_pivot,
+        "analyses": {label: _index_results(results, history, prices_pivot) for label, results in payload["results"].items()}
+    }
+    return dataset, payload["as_of"], payload["built_at"]
@@ -0,0 +1,186 @@
+# src/price_store.py
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from src.analyzer import prepare_price_pivot
+
+# Tăng khi thay đổi cấu trúc file snapshot để các worker bỏ qua snapshot cũ
+SNAPSHOT_FORMAT_VERSION = 1
+
+_PRICES_FILE = 'prices.npy'
+_DATES_FILE = 'dates.npy'
+_TICKERS_FILE = 'tickers.json'
+_META_FILE = 'meta.json'
+_CURRENT_FILE = 'CURRENT'
+
+
+def source_key(gdrive_url: str, price_sheet: str) -> str:
+    """
+    Khóa thư mục cho một nguồn dữ liệu giá (link + tên sheet).
+    """
+    return hashlib.sha1(f"{gdrive_url}|{price_sheet}".encode('utf-8')).hexdigest()[:16]
+
+
+def price_fingerprint(df_price: pd.DataFrame) -> str:
+    """
+    Phiên bản của dữ liệu giá: hash nội dung các cột Date / Stock / Price.
+    """
+    cols = [col for col in ['Date', 'Stock', 'Price'] if col in df_price.columns]
+    hashed = pd.util.hash_pandas_object(df_price[cols], index=False).to_numpy()
+    digest = hashlib.sha1(hashed.tobytes())
+    digest.update(str(SNAPSHOT_FORMAT_VERSION).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def write_price_snapshot(prices_pivot: pd.DataFrame, source_dir: str, version: str) -> str:
+    """
+    Ghi ma trận giá (ngày × mã, float64), trục ngày và danh sách mã thành snapshot nhị phân.
+
+    Snapshot được ghi vào thư mục tạm rồi đổi tên (atomic), sau đó con trỏ CURRENT
+    được thay bằng os.replace, nên worker khác không bao giờ đọc phải snapshot dở dang.
+    Nếu worker khác đã ghi cùng phiên bản, giữ nguyên bản đã có.
+
+    Returns:
+        str: Đường dẫn thư mục snapshot.
+    """
+    os.makedirs(source_dir, exist_ok=True)
+    final_dir = os.path.join(source_dir, version)
+
+    if not os.path.exists(final_dir):
+        tmp_dir = tempfile.mkdtemp(prefix=f'.{version}-', dir=source_dir)
+        try:
+            prices = np.ascontiguousarray(prices_pivot.to_numpy(dtype=np.float64))
+            np.save(os.path.join(tmp_dir, _PRICES_FILE), prices)
+            np.save(os.path.join(tmp_dir, _DATES_FILE), prices_pivot.index.to_numpy(dtype='datetime64[ns]').astype(np.int64))
+            with open(os.path.join(tmp_dir, _TICKERS_FILE), 'w', encoding='utf-8') as f:
+                json.dump([str(col) for col in prices_pivot.columns], f, ensure_ascii=False)
+            with open(os.path.join(tmp_dir, _META_FILE), 'w', encoding='utf-8') as f:
+                json.dump({
+                    'format': SNAPSHOT_FORMAT_VERSION,
+                    'version': version,
+                    'shape': list(prices.shape),
+                    'created_at': time.time()
+                }, f)
+            os.rename(tmp_dir, final_dir)
+        except OSError:
+            # Worker khác đã đổi tên thành công trước -> dùng bản của worker đó
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.exists(final_dir):
+                raise
+
+    _set_current(source_dir, version)
+    prune_price_snapshots(source_dir)
+    return final_dir
+
+
+def _set_current(source_dir: str, version: str):
+    """
+    Trỏ CURRENT tới phiên bản mới (thay file atomic bằng os.replace).
+    File tạm có tên riêng cho mỗi lần ghi, vì các phiên Streamlit là các thread trong cùng
+    một process và có thể cập nhật CURRENT cùng lúc.
+    """
+    fd, pointer_tmp = tempfile.mkstemp(prefix=f'.{_CURRENT_FILE}-', dir=source_dir)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(pointer_tmp, os.path.join(source_dir, _CURRENT_FILE))
+    except BaseException:
+        if os.path.exists(pointer_tmp):
+            os.unlink(pointer_tmp)
+        raise
+
+
+def prune_price_snapshots(source_dir: str, keep: int = 2):
+    """
+    Xóa các snapshot cũ, giữ lại `keep` bản mới nhất và bản CURRENT đang trỏ tới. Process
+    đang mmap snapshot bị xóa vẫn đọc được (trên POSIX file chỉ thực sự bị xóa khi không
+    còn ai mở).
+    """
+    current = latest_price_snapshot(source_dir)
+    snapshots = [os.path.join(source_dir, name) for name in os.listdir(source_dir)
+                 if not name.startswith('.') and os.path.isdir(os.path.join(source_dir, name))]
+    snapshots.sort(key=lambda path: snapshot_created_at(path) or 0, reverse=True)
+    for path in snapshots[keep:]:
+        if path != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def open_price_snapshot(snapshot_dir: str) -> pd.DataFrame:
+    """
+    Mở snapshot bằng memory mapping. DataFrame trả về dùng trực tiếp vùng nhớ của file
+    (chỉ đọc), nên các process cùng mở một snapshot chia sẻ cùng các trang vật lý.
+    """
+    with open(os.path.join(snapshot_dir, _META_FILE), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format') != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Snapshot giá không đúng định dạng: {snapshot_dir}")
+
+    prices = np.load(os.path.join(snapshot_dir, _PRICES_FILE), mmap_mode='r')
+    dates = np.load(os.path.join(snapshot_dir, _DATES_FILE)).astype('datetime64[ns]')
+    with open(os.path.join(snapshot_dir, _TICKERS_FILE), encoding='utf-8') as f:
+        tickers = json.load(f)
+
+    return pd.DataFrame(
+        prices,
+        index=pd.DatetimeIndex(dates, name='Date'),
+        columns=pd.Index(tickers, name='Stock'),
+        copy=False
+    )
+
+
+def snapshot_created_at(snapshot_dir: str) -> Optional[float]:
+    """
+    Thời điểm (epoch) snapshot được tạo, None nếu không đọc được.
+    """
+    try:
+        with open(os.path.join(snapshot_dir, _META_FILE), encoding='utf-8') as f:
+            return json.load(f).get('created_at')
+    except (OSError, ValueError):
+        return None
+
+
+def latest_price_snapshot(source_dir: str, max_age: Optional[float] = None) -> Optional[str]:
+    """
+    Đường dẫn snapshot mà con trỏ CURRENT đang trỏ tới, hoặc None nếu chưa có / đã quá max_age giây.
+    Tuổi tính theo lần cuối CURRENT được ghi (lần cuối dữ liệu giá được tải và đối chiếu).
+    """
+    pointer = os.path.join(source_dir, _CURRENT_FILE)
+    try:
+        with open(pointer, encoding='utf-8') as f:
+            version = f.read().strip()
+        verified_at = os.path.getmtime(pointer)
+    except OSError:
+        return None
+
+    snapshot_dir = os.path.join(source_dir, version)
+    if snapshot_created_at(snapshot_dir) is None:
+        return None
+    if max_age is not None and time.time() - verified_at > max_age:
+        return None
+    return snapshot_dir
+
+
+def load_price_matrix(df_price: pd.DataFrame, source_dir: str) -> pd.DataFrame:
+    """
+    Trả về ma trận giá dạng memory-mapped cho dữ liệu giá đã tải.
+    Nếu đã có snapshot cùng phiên bản (cùng nội dung) thì chỉ mmap, không pivot lại.
+    """
+    version = price_fingerprint(df_price)
+    snapshot_dir = os.path.join(source_dir, version)
+    if snapshot_created_at(snapshot_dir) is None:
+        prices_pivot = prepare_price_pivot(df_price)
+        try:
+            snapshot_dir = write_price_snapshot(prices_pivot, source_dir, version)
+        except OSError:
+            # Không ghi được snapshot (vd: thư mục chỉ đọc) -> dùng ma trận trong bộ nhớ
+            return prices_pivot
+    else:
+        _set_current(source_dir, version)
+    return open_price_snapshot(snapshot_dir)
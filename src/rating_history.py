@@ -0,0 +1,161 @@
+# src/rating_history.py
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Any, Sequence
+
+
+class RatingHistory:
+    """
+    Lịch sử khuyến nghị dạng nén thay cho ma trận ngày × mã (object dtype).
+
+    Chỉ lưu các ô có giá trị trong sheet (quan sát), sắp xếp theo (mã, ngày),
+    với rating được mã hóa thành số nguyên nhỏ (int8). Từ đó suy ra các điểm
+    thay đổi (run-length): mỗi run bắt đầu tại quan sát đầu tiên của mã hoặc
+    khi rating khác quan sát liền trước. Bộ nhớ và thời gian tỉ lệ với số ô
+    có dữ liệu / số lần đổi rating, không phụ thuộc số ngày × số mã.
+    """
+
+    def __init__(self, tickers: List[str], categories: List[str],
+                 obs_ticker: np.ndarray, obs_date: np.ndarray, obs_code: np.ndarray):
+        self.tickers = list(tickers)
+        self.categories = list(categories)
+        self.obs_ticker = obs_ticker
+        self.obs_date = obs_date
+        self.obs_code = obs_code
+
+        n_tickers = len(self.tickers)
+        self.obs_offsets = np.concatenate(([0], np.cumsum(np.bincount(obs_ticker, minlength=n_tickers))))
+
+        # Điểm thay đổi: quan sát đầu tiên của mỗi mã hoặc rating khác quan sát trước đó
+        is_change = np.ones(len(obs_code), dtype=bool)
+        if len(obs_code) > 1:
+            same_ticker = obs_ticker[1:] == obs_ticker[:-1]
+            is_change[1:] = ~same_ticker | (obs_code[1:] != obs_code[:-1])
+        change_pos = np.flatnonzero(is_change)
+
+        self.change_ticker = obs_ticker[change_pos]
+        self.change_date = obs_date[change_pos]
+        self.change_code = obs_code[change_pos]
+        # Rating của run trước đó (-1 nếu là run đầu tiên của mã)
+        self.change_prev_code = np.full(len(change_pos), -1, dtype=obs_code.dtype)
+        if len(change_pos) > 1:
+            continues = self.change_ticker[1:] == self.change_ticker[:-1]
+            self.change_prev_code[1:] = np.where(continues, self.change_code[:-1], -1)
+        self.change_offsets = np.concatenate(([0], np.cumsum(np.bincount(self.change_ticker, minlength=n_tickers))))
+
+    @classmethod
+    def from_sheet(cls, df_rec: pd.DataFrame) -> 'RatingHistory':
+        """
+        Dựng lịch sử trực tiếp từ sheet khuyến nghị (index là ngày, mỗi cột là một mã).
+        Bỏ qua các cột 'Unnamed', các dòng không phải ngày hợp lệ và các ô trống.
+        """
+        dates = pd.to_datetime(df_rec.index, errors='coerce').to_numpy(dtype='datetime64[ns]')
+        valid_rows = ~np.isnat(dates)
+
+        tickers, tick_parts, date_parts, value_parts = [], [], [], []
+        for col in df_rec.columns:
+            if str(col).startswith('Unnamed'):
+                continue
+            values = df_rec[col].to_numpy()
+            mask = valid_rows & pd.notna(values)
+            if not mask.any():
+                continue
+            tick_parts.append(np.full(mask.sum(), len(tickers), dtype=np.int32))
+            date_parts.append(dates[mask])
+            value_parts.append(values[mask])
+            tickers.append(col)
+
+        if not tickers:
+            return cls([], [], np.array([], dtype=np.int32),
+                       np.array([], dtype='datetime64[ns]'), np.array([], dtype=np.int8))
+
+        obs_ticker = np.concatenate(tick_parts)
+        obs_date = np.concatenate(date_parts)
+        codes, categories = pd.factorize(np.concatenate(value_parts))
+        code_dtype = np.int8 if len(categories) <= np.iinfo(np.int8).max else np.int16
+
+        # Sắp xếp theo (mã, ngày); sort ổn định giữ thứ tự dòng gốc khi trùng ngày
+        order = np.lexsort((obs_date, obs_ticker))
+        return cls(tickers, list(categories), obs_ticker[order], obs_date[order], codes.astype(code_dtype)[order])
+
+    @property
+    def empty(self) -> bool:
+        return len(self.obs_code) == 0
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.obs_ticker, self.obs_date, self.obs_code, self.obs_offsets,
+                  self.change_ticker, self.change_date, self.change_code,
+                  self.change_prev_code, self.change_offsets]
+        return sum(a.nbytes for a in arrays)
+
+    def code_of(self, rating: str) -> int:
+        """
+        Trả về mã số của rating, hoặc -2 nếu rating chưa từng xuất hiện (không khớp run nào).
+        """
+        return self.categories.index(rating) if rating in self.categories else -2
+
+    def _to_frame(self, ticker_codes: np.ndarray, dates: np.ndarray, date_col: str) -> pd.DataFrame:
+        return pd.DataFrame({
+            'Cổ phiếu': np.array(self.tickers, dtype=object)[ticker_codes] if len(ticker_codes) else np.array([], dtype=object),
+            date_col: dates
+        })
+
+    def transitions(self, from_rating: str, to_rating: str, date_col: str = 'Ngày thay đổi') -> pd.DataFrame:
+        """
+        Các lần một mã chuyển từ from_rating sang to_rating (giá trị ffill theo thời gian).
+        """
+        mask = (self.change_prev_code == self.code_of(from_rating)) & (self.change_code == self.code_of(to_rating))
+        return self._to_frame(self.change_ticker[mask], self.change_date[mask], date_col)
+
+    def point_ratings(self, rating: str, date_col: str = 'Ngày khuyến nghị') -> pd.DataFrame:
+        """
+        Tất cả các ô trong sheet có giá trị đúng bằng rating.
+        """
+        mask = self.obs_code == self.code_of(rating)
+        return self._to_frame(self.obs_ticker[mask], self.obs_date[mask], date_col)
+
+    def rating_as_of(self, date: Any) -> pd.Series:
+        """
+        Rating hiệu lực của mọi mã tại một ngày (quan sát gần nhất <= date), NaN nếu chưa có.
+        """
+        cutoff = np.datetime64(pd.Timestamp(date), 'ns')
+        counts = np.bincount(self.change_ticker[self.change_date <= cutoff], minlength=len(self.tickers))
+        last = self.change_offsets[:-1] + counts - 1
+        categories = np.array(self.categories + [np.nan], dtype=object)
+        codes = np.where(counts > 0, self.change_code[np.maximum(last, 0)] if len(last) else last, -1)
+        return pd.Series(categories[codes], index=self.tickers, dtype=object)
+
+    def next_change_dates(self, tickers: Sequence[str], dates: Any) -> np.ndarray:
+        """
+        Với mỗi cặp (mã, ngày), trả về ngày đổi rating kế tiếp sau ngày đó (NaT nếu không có).
+        Tìm kiếm vector hóa trên khóa (mã, ngày) của các điểm thay đổi.
+        """
+        lookup = {t: i for i, t in enumerate(self.tickers)}
+        codes = np.array([lookup.get(t, -1) for t in tickers], dtype=np.int64)
+        days = pd.to_datetime(dates).to_numpy(dtype='datetime64[D]').astype(np.int64)
+        change_days = self.change_date.astype('datetime64[D]').astype(np.int64)
+
+        # Khóa kết hợp (mã, ngày) giữ đúng thứ tự sắp xếp của các điểm thay đổi
+        span = int(max(change_days.max(initial=0), days.max(initial=0)) - min(change_days.min(initial=0), days.min(initial=0)) + 1)
+        base = min(change_days.min(initial=0), days.min(initial=0))
+        change_keys = self.change_ticker.astype(np.int64) * span + (change_days - base)
+        keys = codes * span + (days - base)
+
+        pos = np.searchsorted(change_keys, keys, side='right')
+        found = (codes >= 0) & (pos < len(change_keys))
+        found[found] &= self.change_ticker[pos[found]] == codes[found]
+        result = np.full(len(codes), np.datetime64('NaT'), dtype='datetime64[ns]')
+        result[found] = self.change_date[pos[found]]
+        return result
+
+    def rating_of(self, ticker: str, date: Any) -> Optional[str]:
+        """
+        Rating hiệu lực của một mã tại một ngày, None nếu chưa có.
+        """
+        if ticker not in self.tickers:
+            return None
+        i = self.tickers.index(ticker)
+        start, end = self.change_offsets[i], self.change_offsets[i + 1]
+        pos = np.searchsorted(self.change_date[start:end], np.datetime64(pd.Timestamp(date), 'ns'), side='right') - 1
+        return self.categories[self.change_code[start + pos]] if pos >= 0 else None
@@ -0,0 +1,157 @@
+# src/refresher.py
+import datetime
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+from src.single_flight import SingleFlight, flight as default_flight
+
+
+class DataSnapshot:
+    """
+    Một bản dữ liệu đã xử lý xong, không thay đổi sau khi được công bố.
+
+    Attributes:
+        data: Kết quả của hàm build (vd: dataset từ src.pipeline.build_dataset).
+        as_of (datetime.datetime): Lần cuối nguồn dữ liệu được tải và xác nhận khớp với bản này.
+        built_at (datetime.datetime): Thời điểm bản này được dựng.
+        verified (bool): False nếu bản được khôi phục từ đĩa (có thể do phiên bản code cũ dựng);
+            lần làm mới kế tiếp sẽ dựng lại đầy đủ thay vì giữ bản này khi nguồn không đổi.
+    """
+
+    def __init__(self, data: Any, as_of: datetime.datetime, built_at: datetime.datetime, verified: bool = True):
+        self.data = data
+        self.as_of = as_of
+        self.built_at = built_at
+        self.verified = verified
+
+
+class BackgroundRefresher:
+    """
+    Làm mới dữ liệu định kỳ trong một thread nền, ngoài luồng xử lý yêu cầu của người dùng.
+
+    Mỗi chu kỳ gọi build_fn(previous_data): hàm trả về dữ liệu mới, hoặc trả về chính
+    previous_data nếu nguồn không đổi (khi đó chỉ cập nhật as_of). Bản mới được thay vào
+    bằng một phép gán tham chiếu dưới lock, nên người dùng luôn đọc được bản hoàn chỉnh
+    gần nhất và không bao giờ phải chờ tải. Nếu build lỗi, bản cũ vẫn được giữ và lỗi được
+    lưu trong last_error.
+
+    Có thể khởi tạo với một bản đã lưu từ lần chạy trước (initial) để phục vụ ngay khi
+    process vừa khởi động; on_publish được gọi sau mỗi lần công bố (vd: để lưu lại bản mới).
+
+    Mọi lần làm mới (chu kỳ nền và các phiên phải chờ lần tải đầu tiên) đi qua single-flight
+    với cùng khóa, ngoài mọi st.cache_*: các phiên đến khi một lần dựng đang chạy chỉ chờ
+    và nhận cùng kết quả hoặc cùng lỗi, không dựng lại.
+    """
+
+    def __init__(self, build_fn: Callable[[Optional[Any]], Any], interval: float, name: str = 'data-refresher',
+                 key: Optional[Hashable] = None, flight: Optional[SingleFlight] = None,
+                 initial: Optional[DataSnapshot] = None,
+                 on_publish: Optional[Callable[[DataSnapshot], Any]] = None):
+        self._build_fn = build_fn
+        self._interval = interval
+        self._name = name
+        self._key = ('dataset', key if key is not None else name)
+        self._flight = flight if flight is not None else default_flight
+        self._lock = threading.Lock()
+        self._snapshot: Optional[DataSnapshot] = initial
+        self._on_publish = on_publish
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_error: Optional[BaseException] = None
+        self.last_attempt: Optional[datetime.datetime] = None
+
+    def start(self) -> 'BackgroundRefresher':
+        """
+        Khởi động thread nền (gọi nhiều lần không tạo thêm thread).
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh_once()
+            except Exception:
+                pass  # Đã ghi vào last_error, giữ bản cũ và thử lại ở chu kỳ sau
+            self._wake.wait(self._interval)
+            self._wake.clear()
+
+    def refresh_once(self) -> DataSnapshot:
+        """
+        Chạy một lần làm mới, hoặc chờ lần đang chạy (single-flight).
+
+        Returns:
+            DataSnapshot: Bản dữ liệu sau lần làm mới.
+
+        Raises:
+            Exception: Lỗi của hàm build (bản cũ vẫn được giữ, lỗi được lưu trong last_error).
+        """
+        try:
+            return self._flight.do(self._key, self._refresh)
+        except Exception as e:
+            self.last_error = e
+            raise
+
+    def _refresh(self) -> DataSnapshot:
+        self.last_attempt = datetime.datetime.now()
+        previous = self._snapshot
+        # Bản chưa xác nhận (khôi phục từ đĩa) không được dùng lại: luôn dựng lại với code hiện tại
+        data = self._build_fn(previous.data if previous is not None and previous.verified else None)
+
+        now = datetime.datetime.now()
+        if previous is not None and data is previous.data:
+            snapshot = DataSnapshot(previous.data, as_of=now, built_at=previous.built_at)
+        else:
+            snapshot = DataSnapshot(data, as_of=now, built_at=now)
+
+        with self._lock:
+            self._snapshot = snapshot
+        self.last_error = None
+        if self._on_publish is not None:
+            self._on_publish(snapshot)
+        return snapshot
+
+    def latest(self) -> Optional[DataSnapshot]:
+        """
+        Bản dữ liệu hoàn chỉnh gần nhất, None nếu chưa có lần dựng nào thành công.
+        """
+        with self._lock:
+            return self._snapshot
+
+    def ensure_ready(self) -> DataSnapshot:
+        """
+        Bản dữ liệu gần nhất; nếu chưa có (process vừa khởi động) thì chạy hoặc chờ chung
+        lần làm mới đang diễn ra thay vì mỗi phiên tự tải.
+
+        Raises:
+            Exception: Lỗi của lần dựng mà phiên này đã chờ.
+        """
+        snapshot = self.latest()
+        return snapshot if snapshot is not None else self.refresh_once()
+
+
+# Bộ làm mới đang chạy theo nguồn, dùng chung cho toàn process. Không giữ trong st.cache_resource:
+# xóa cache (menu "Clear cache", st.cache_resource.clear()) sẽ tạo thread mới trong khi thread
+# cũ vẫn tiếp tục tải và ghi đè cùng file.
+_refreshers: Dict[Hashable, BackgroundRefresher] = {}
+_refreshers_lock = threading.Lock()
+
+
+def get_or_start_refresher(key: Hashable, factory: Callable[[], BackgroundRefresher]) -> BackgroundRefresher:
+    """
+    Trả về bộ làm mới của nguồn `key`, chỉ gọi factory() để tạo khi chưa có, và đảm bảo
+    thread nền đang chạy.
+    """
+    with _refreshers_lock:
+        refresher = _refreshers.get(key)
+        if refresher is None:
+            refresher = _refreshers[key] = factory()
+        return refresher.start()
@@ -0,0 +1,100 @@
+# src/single_flight.py
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    """
+    Một lần tải / tính toán đang chạy mà các yêu cầu trùng khóa sẽ chờ.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Gộp các yêu cầu đồng thời có cùng khóa thành một lần thực thi duy nhất.
+
+    Yêu cầu đầu tiên (leader) chạy hàm; các yêu cầu đến trong lúc hàm đang chạy
+    chỉ chờ và nhận cùng kết quả. Nếu hàm lỗi, cùng exception được raise cho
+    leader và tất cả các yêu cầu đang chờ. Khi lần chạy kết thúc, khóa được giải
+    phóng nên yêu cầu sau đó sẽ chạy lại (việc giữ kết quả do nơi gọi đảm nhận, vd:
+    BackgroundRefresher giữ snapshot gần nhất).
+
+    Phải gọi bên ngoài các hàm st.cache_*: Streamlit đã giữ lock theo từng khóa cache khi
+    tính, nên các yêu cầu trùng bị chặn trước khi tới đây và không bao giờ được gộp.
+
+    Streamlit chạy mỗi phiên trong một thread của cùng process, nên gộp ở mức thread là đủ
+    cho một worker; giữa các worker, dữ liệu giá đã được chia sẻ qua snapshot trên đĩa.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._metrics = Counter()
+        self._coalesced_by_kind = Counter()
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Chạy fn(*args, **kwargs) hoặc chờ lần chạy đang diễn ra với cùng khóa.
+
+        Args:
+            key (Hashable): Khóa (nguồn, tham số). Nếu là tuple, phần tử đầu được dùng làm
+                nhóm trong thống kê (vd: ('dataset', url, ...)).
+            fn (Callable): Hàm tải / tính toán.
+
+        Returns:
+            Any: Kết quả của fn (dùng chung giữa leader và các yêu cầu chờ).
+        """
+        with self._lock:
+            self._metrics['calls'] += 1
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self._metrics['coalesced'] += 1
+                self._coalesced_by_kind[key[0] if isinstance(key, tuple) and key else key] += 1
+
+        if is_leader:
+            try:
+                call.result = fn(*args, **kwargs)
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                    self._metrics['executions'] += 1
+                    if call.error is not None:
+                        self._metrics['errors'] += 1
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Thống kê: tổng số yêu cầu, số lần thực thi thật, số yêu cầu được gộp, số lần lỗi,
+        số lần chạy đang diễn ra và số yêu cầu được gộp theo nhóm khóa.
+        """
+        with self._lock:
+            return {
+                'calls': self._metrics['calls'],
+                'executions': self._metrics['executions'],
+                'coalesced': self._metrics['coalesced'],
+                'errors': self._metrics['errors'],
+                'in_flight': len(self._calls),
+                'coalesced_by_kind': dict(self._coalesced_by_kind)
+            }
+
+
+# Dùng chung cho toàn process (module được import một lần, không bị chạy lại mỗi lần rerun)
+flight = SingleFlight()
@@ -2,8 +2,10 @@
 import streamlit as st
 import pandas as pd
 from pandas.tseries.offsets import DateOffset
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Optional
+from config import PERIOD_OPTIONS
 from src.utils import to_excel
+from src.win_rate_cube import UNKNOWN_SECTOR
 import base64
 import streamlit.components.v1 as components # Import component HTML
 import datetime # Thêm thư viện datetime
@@ -15,20 +17,14 @@ def setup_sidebar() -> Tuple[DateOffset, str]:
     """
     st.sidebar.header("⚙️ Tùy chọn Phân tích")
 
-    period_options = {
-        '3 tháng': (DateOffset(months=3), '3T'),
-        '6 tháng': (DateOffset(months=6), '6T'),
-        '1 năm': (DateOffset(months=12), '1Y')
-    }
-
     # Mặc định vẫn là '6 tháng'
     selected_period = st.sidebar.selectbox(
         "Chọn khoảng thời gian tính hiệu suất:",
-        options=list(period_options.keys()),
+        options=list(PERIOD_OPTIONS.keys()),
         index=1
     )
 
-    period_offset, period_label = period_options[selected_period]
+    period_offset, period_label = PERIOD_OPTIONS[selected_period]
 
     # Thêm chú thích về cách xác định Win Rate
     st.sidebar.markdown("---")
@@ -59,6 +55,174 @@ def setup_sidebar() -> Tuple[DateOffset, str]:
 
     return period_offset, period_label
 
+def setup_filters(tickers: list, min_date: datetime.date, max_date: datetime.date) -> dict:
+    """
+    Hiển thị các widget lọc trong sidebar (mã, khoảng ngày, kết quả rating, ngưỡng Alpha).
+
+    Returns:
+        dict: Tham số lọc dùng cho src.event_index.filter_results.
+    """
+    st.sidebar.markdown("---")
+    st.sidebar.header("🔎 Bộ lọc kết quả")
+
+    selected_tickers = st.sidebar.multiselect("Mã cổ phiếu:", options=tickers)
+
+    date_range = st.sidebar.date_input(
+        "Khoảng ngày:",
+        value=(min_date, max_date),
+        min_value=min_date,
+        max_value=max_date
+    )
+    # date_input trả về tuple 1 phần tử khi người dùng mới chọn ngày bắt đầu
+    start_date = date_range[0] if len(date_range) > 0 else None
+    end_date = date_range[1] if len(date_range) > 1 else None
+
+    rating_options = {'Tất cả': None, 'Outperform': 'Outperform', 'Underperform': 'Underperform', 'N/A': 'N/A'}
+    selected_rating = st.sidebar.selectbox("Kết quả rating:", options=list(rating_options.keys()))
+
+    use_alpha = st.sidebar.checkbox("Lọc theo Alpha tối thiểu")
+    min_alpha = None
+    if use_alpha:
+        min_alpha = st.sidebar.number_input("Alpha tối thiểu (%):", value=0.0, step=1.0) / 100
+
+    return {
+        'tickers': selected_tickers,
+        'start_date': start_date,
+        'end_date': end_date,
+        'rating': rating_options[selected_rating],
+        'min_alpha': min_alpha
+    }
+
+def _parse_weights(text: str) -> Dict[str, float]:
+    """
+    Parse chuỗi tỷ trọng dạng "VNM:2, FPT:1" thành từ điển {mã: tỷ trọng}.
+    """
+    weights = {}
+    for part in text.split(','):
+        if ':' not in part:
+            continue
+        ticker, value = part.rsplit(':', 1)
+        try:
+            weights[ticker.strip()] = float(value.strip())
+        except ValueError:
+            continue
+    return weights
+
+def setup_backtest_options() -> Optional[dict]:
+    """
+    Hiển thị các tùy chọn backtest trong sidebar.
+
+    Returns:
+        Optional[dict]: Tham số cho src.backtest.run_backtest, hoặc None nếu chưa bật backtest.
+    """
+    st.sidebar.markdown("---")
+    st.sidebar.header("📈 Backtest danh mục")
+
+    if not st.sidebar.checkbox("Bật chế độ Backtest"):
+        return None
+
+    signal_options = {
+        'BUY (mua)': 'Khuyen_nghi_BUY',
+        'UNDER-PERFORM (bán)': 'Khuyen_nghi_UnderPerform',
+        'MP → Out (mua)': 'MarketPerform_sang_Out',
+        'Out → MP (bán)': 'Out_sang_MarketPerform'
+    }
+    selected_signals = st.sidebar.multiselect(
+        "Tín hiệu:",
+        options=list(signal_options.keys()),
+        default=['BUY (mua)']
+    )
+
+    holding = st.sidebar.radio(
+        "Thời gian nắm giữ:",
+        options=['Theo khoảng thời gian đã chọn', 'Đến khi đổi rating']
+    )
+
+    weighting = st.sidebar.radio("Tỷ trọng:", options=['Đều nhau', 'Tùy chỉnh'])
+    weights = None
+    if weighting == 'Tùy chỉnh':
+        weights = _parse_weights(st.sidebar.text_input("Tỷ trọng theo mã (vd: VNM:2, FPT:1):"))
+
+    return {
+        'signals': [signal_options[s] for s in selected_signals],
+        'hold_until_change': holding == 'Đến khi đổi rating',
+        'weights': weights or None
+    }
+
+def display_backtest(nav_df: pd.DataFrame, stats: Dict[str, float], outcome_filters_ignored: bool = False):
+    """
+    Hiển thị kết quả backtest: các chỉ số tổng hợp, NAV so với VNINDEX và turnover.
+    """
+    st.subheader("📈 Kết quả Backtest")
+    if outcome_filters_ignored:
+        st.caption("ℹ️ Bộ lọc kết quả rating / Alpha không áp dụng cho backtest vì dựa trên lợi nhuận sau khuyến nghị.")
+    if nav_df.empty:
+        st.info("Không có tín hiệu nào khớp với dữ liệu giá để backtest.")
+        return
+
+    metric_cols = st.columns(5)
+    metric_cols[0].metric("Lợi nhuận tích lũy", f"{stats['Lợi nhuận tích lũy']:.1%}")
+    metric_cols[1].metric("Lợi nhuận VNINDEX", f"{stats['Lợi nhuận VNINDEX']:.1%}")
+    metric_cols[2].metric("Excess năm hóa", f"{stats['Excess năm hóa']:+.1%}")
+    metric_cols[3].metric("Max drawdown", f"{stats['Max drawdown']:.1%}")
+    metric_cols[4].metric("Turnover TB/ngày", f"{stats['Turnover TB/ngày']:.2%}")
+
+    st.line_chart(nav_df[['NAV', 'NAV VNINDEX', 'Excess NAV']])
+    st.area_chart(nav_df['Turnover'])
+
+    stats_df = pd.DataFrame({'Chỉ số': list(stats.keys()), 'Giá trị': list(stats.values())})
+    st.dataframe(stats_df, hide_index=True)
+
+def display_cube_explorer(cube):
+    """
+    Hiển thị bảng Win Rate theo chiều tùy chọn (năm, quý, tháng, mã, ngành),
+    tính bằng cách cộng các ô của cube tổng hợp (src.win_rate_cube.WinRateCube).
+    """
+    st.subheader("🧊 Win Rate theo nhiều chiều")
+
+    dimension_options = {'Năm': 'Năm', 'Quý': 'Quý', 'Tháng': 'Tháng', 'Cổ phiếu': 'Cổ phiếu', 'Ngành': 'Ngành'}
+    # Chỉ cho nhóm theo ngành khi SECTOR_MAPPING có gán ngành cho ít nhất một mã
+    if not (cube.cells['Ngành'] != UNKNOWN_SECTOR).any():
+        dimension_options.pop('Ngành')
+    col1, col2 = st.columns(2)
+    row_dim = col1.selectbox("Nhóm theo:", options=list(dimension_options.keys()), index=0)
+    years = sorted(cube.cells['Năm'].unique().tolist())
+    selected_years = col2.multiselect("Năm:", options=years)
+
+    filters = {'Năm': selected_years} if selected_years else None
+    table = cube.win_rate_table(dimension_options[row_dim], filters)
+    if table.empty:
+        st.info("Không có dữ liệu cho lựa chọn này.")
+        return
+
+    # Làm phẳng header 2 tầng để hiển thị bằng st.dataframe
+    table.columns = [f"{col[0]} {col[1]}".strip() for col in table.columns]
+    st.dataframe(table, hide_index=True)
+
+def display_data_status(as_of: datetime.datetime, last_error: Optional[BaseException] = None):
+    """
+    Hiển thị thời điểm của bản dữ liệu đang dùng và lỗi làm mới gần nhất (nếu có).
+    """
+    st.caption(f"🕒 Dữ liệu tính đến: {as_of:%Y-%m-%d %H:%M:%S}")
+    if last_error is not None:
+        st.caption(f"⚠️ Lần làm mới gần nhất thất bại, đang dùng bản trước đó: {last_error}")
+
+def display_flight_metrics(metrics: dict):
+    """
+    Hiển thị thống kê gộp yêu cầu làm mới dữ liệu (single-flight) trong sidebar: chu kỳ nền
+    và các phiên chờ lần tải đầu tiên dùng chung một lần tải + xử lý.
+    """
+    with st.sidebar.expander("🛰️ Thống kê tải dữ liệu"):
+        st.markdown(f"""
+        - Tổng số yêu cầu làm mới: **{metrics['calls']}**
+        - Số lần tải + xử lý thực tế: **{metrics['executions']}**
+        - Yêu cầu trùng được gộp: **{metrics['coalesced']}**
+        - Số lần lỗi: **{metrics['errors']}**
+        - Đang chạy: **{metrics['in_flight']}**
+        """)
+        for kind, count in metrics['coalesced_by_kind'].items():
+            st.caption(f"Gộp '{kind}': {count}")
+
 def create_download_link_html(df_dict: dict, filename: str, link_text: str) -> str:
     excel_data = to_excel(df_dict)
     b64 = base64.b64encode(excel_data).decode()
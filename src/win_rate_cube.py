@@ -0,0 +1,150 @@
+# src/win_rate_cube.py
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Any
+from src.analyzer import DISPLAY_NAMES, target_rating_for, parse_percentages
+
+# Các chiều của cube (Ngành lấy từ sector mapping, mã không có trong mapping -> 'Khác')
+DIMENSIONS = ['Loại', 'Năm', 'Quý', 'Tháng', 'Cổ phiếu', 'Ngành']
+# Các giá trị cộng dồn được lưu trong mỗi ô
+MEASURES = ['Số sự kiện', 'Số lượng', 'Thắng', 'Tổng Alpha', 'Số Alpha']
+
+UNKNOWN_SECTOR = 'Khác'
+
+
+def _format_win_rate(wins: int, total: int) -> str:
+    return f"{wins / total:.0%} ({wins}/{total})" if total > 0 else '—'
+
+
+def _format_alpha(alpha_sum: float, alpha_n: int) -> str:
+    return f"{alpha_sum / alpha_n:+.1%}" if alpha_n > 0 else '—'
+
+
+class WinRateCube:
+    """
+    Cube tổng hợp dựng sẵn trên các bảng kết quả: Loại × Năm/Quý/Tháng × Cổ phiếu × Ngành.
+
+    Mỗi ô lưu số sự kiện, số sự kiện có rating (khác 'N/A'), số lần thắng, tổng Alpha và
+    số Alpha hợp lệ. Mọi phép roll-up (vd: win rate theo ngành năm 2023, theo tháng qua
+    tất cả các năm) chỉ là cộng các ô, không phải quét lại các sự kiện.
+    """
+
+    def __init__(self, cells: pd.DataFrame, categories: List[str]):
+        self.cells = cells
+        self.categories = categories
+
+    @classmethod
+    def from_results(cls, results: Dict[str, pd.DataFrame], sector_mapping: Optional[Dict[str, str]] = None) -> 'WinRateCube':
+        """
+        Dựng cube từ các bảng kết quả của process_stock_data.
+        """
+        sector_mapping = sector_mapping or {}
+        frames = []
+        for name, df in results.items():
+            date_col = next((col for col in df.columns if 'Ngày' in col), None)
+            if df.empty or date_col is None or 'Rating' not in df.columns:
+                continue
+
+            dates = pd.to_datetime(df[date_col])
+            rated = (df['Rating'] != 'N/A').to_numpy()
+            vs_col = next((col for col in df.columns if 'vs VNINDEX' in col), None)
+            alpha = np.full(len(df), np.nan)
+            if vs_col:
+                alpha = parse_percentages(df[vs_col])
+            alpha = np.where(rated, alpha, np.nan)
+
+            frames.append(pd.DataFrame({
+                'Loại': name,
+                'Năm': dates.dt.year.to_numpy(),
+                'Quý': dates.dt.quarter.to_numpy(),
+                'Tháng': dates.dt.month.to_numpy(),
+                'Cổ phiếu': df['Cổ phiếu'].to_numpy(),
+                'Ngành': df['Cổ phiếu'].map(lambda t: sector_mapping.get(t, UNKNOWN_SECTOR)).to_numpy(),
+                'Số sự kiện': 1,
+                'Số lượng': rated.astype(np.int64),
+                'Thắng': (rated & (df['Rating'] == target_rating_for(name)).to_numpy()).astype(np.int64),
+                'Tổng Alpha': np.nan_to_num(alpha, nan=0.0),
+                'Số Alpha': (~np.isnan(alpha)).astype(np.int64)
+            }))
+
+        if frames:
+            cells = pd.concat(frames, ignore_index=True).groupby(DIMENSIONS, as_index=False, sort=True)[MEASURES].sum()
+        else:
+            cells = pd.DataFrame(columns=DIMENSIONS + MEASURES)
+        return cls(cells, list(results.keys()))
+
+    def rollup(self, by: List[str], filters: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        """
+        Cộng các ô của cube theo các chiều `by`, sau khi lọc theo `filters`.
+
+        Args:
+            by (List[str]): Các chiều giữ lại (con của DIMENSIONS), vd: ['Ngành'].
+            filters (Optional[Dict[str, Any]]): {chiều: giá trị hoặc danh sách giá trị},
+                vd: {'Năm': 2023, 'Loại': 'Khuyen_nghi_BUY'}.
+
+        Returns:
+            pd.DataFrame: Các chiều `by` cùng các giá trị cộng dồn, 'Win Rate' và 'Avg Alpha' (số).
+        """
+        cells = self.cells
+        for dim, value in (filters or {}).items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            cells = cells[cells[dim].isin(values)]
+
+        if by:
+            agg = cells.groupby(list(by), as_index=False, sort=True)[MEASURES].sum()
+        else:
+            agg = cells[MEASURES].sum().to_frame().T
+
+        agg['Win Rate'] = np.where(agg['Số lượng'] > 0, agg['Thắng'] / agg['Số lượng'].where(agg['Số lượng'] > 0, 1), np.nan)
+        agg['Avg Alpha'] = np.where(agg['Số Alpha'] > 0, agg['Tổng Alpha'] / agg['Số Alpha'].where(agg['Số Alpha'] > 0, 1), np.nan)
+        return agg
+
+    def win_rate_table(self, row_dim: str, filters: Optional[Dict[str, Any]] = None, add_total: bool = True) -> pd.DataFrame:
+        """
+        Bảng Win Rate / Avg Alpha theo `row_dim` cho từng loại khuyến nghị, cùng định dạng và
+        header 2 tầng như calculate_win_rate_summary.
+        """
+        # Các hàng gồm mọi giá trị của row_dim có sự kiện (kể cả sự kiện chỉ có rating 'N/A')
+        scope = self.rollup([row_dim], filters)
+        rows = scope.loc[scope['Số sự kiện'] > 0, row_dim].tolist()
+        if not rows:
+            return pd.DataFrame()
+
+        by_row = self.rollup(['Loại', row_dim], filters).set_index(['Loại', row_dim])
+        totals = self.rollup(['Loại'], filters).set_index('Loại')
+
+        summary_data = {}
+        for name in self.categories:
+            win_rates, alphas = [], []
+            for row in rows:
+                if (name, row) in by_row.index:
+                    cell = by_row.loc[(name, row)]
+                    win_rates.append(_format_win_rate(int(cell['Thắng']), int(cell['Số lượng'])))
+                    alphas.append(_format_alpha(cell['Tổng Alpha'], int(cell['Số Alpha'])))
+                else:
+                    win_rates.append('—')
+                    alphas.append('—')
+            if add_total:
+                if name in totals.index:
+                    cell = totals.loc[name]
+                    win_rates.append(_format_win_rate(int(cell['Thắng']), int(cell['Số lượng'])))
+                    alphas.append(_format_alpha(cell['Tổng Alpha'], int(cell['Số Alpha'])))
+                else:
+                    win_rates.append('—')
+                    alphas.append('—')
+
+            display_name = DISPLAY_NAMES.get(name, name)
+            summary_data[(display_name, 'WinRate')] = win_rates
+            summary_data[(display_name, 'Alpha')] = alphas
+
+        index = [str(r) for r in rows] + (['Total'] if add_total else [])
+        summary_df = pd.DataFrame(summary_data, index=index)
+        summary_df.columns = pd.MultiIndex.from_tuples(summary_df.columns)
+        summary_df.index.name = row_dim
+        return summary_df.reset_index()
+
+    def win_rate_summary(self, filters: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        """
+        Tương đương calculate_win_rate_summary (theo năm), nhưng tính từ các ô của cube.
+        """
+        return self.win_rate_table('Năm', filters)
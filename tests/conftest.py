@@ -0,0 +1,45 @@
+# tests/conftest.py
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Cho phép `from src...` / `from config...` như khi chạy `streamlit run main.py` từ thư mục gốc
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+RATINGS = ['OUTPERFORM', 'MARKET-PERFORM', 'BUY', 'UNDER-PERFORM']
+
+
+def make_workbook(n_days: int = 300, n_tickers: int = 12, ratings_per_ticker: int = 10, seed: int = 0):
+    """
+    Dựng workbook giả lập cùng định dạng với file Google Drive.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: (sheet khuyến nghị: index là ngày dạng chuỗi, mỗi cột
+        một mã; bảng giá dạng dài với các cột Date/Stock/Price, có cả VNINDEX).
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2020-01-01', periods=n_days)
+    tickers = [f'T{i:02d}' for i in range(n_tickers)]
+
+    df_rec = pd.DataFrame(index=dates, columns=tickers, dtype=object)
+    for ticker in tickers:
+        for day in rng.choice(n_days, ratings_per_ticker, replace=False):
+            df_rec.loc[dates[day], ticker] = rng.choice(RATINGS)
+    df_rec.index = df_rec.index.strftime('%Y-%m-%d')
+
+    price_dates = pd.bdate_range('2020-01-01', periods=n_days + 200)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (len(price_dates), n_tickers + 1)), axis=0))
+    df_price = pd.DataFrame({
+        'Date': np.tile(price_dates, n_tickers + 1),
+        'Stock': np.repeat(tickers + ['VNINDEX Index'], len(price_dates)),
+        'Price': prices.T.ravel()
+    })
+    return df_rec, df_price
+
+
+@pytest.fixture(params=[0, 1, 2])
+def workbook(request):
+    return make_workbook(seed=request.param)
@@ -0,0 +1,69 @@
+# tests/test_backtest.py
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.tseries.offsets import DateOffset
+
+from config import VNINDEX_TICKER
+from src.backtest import run_backtest
+from src.rating_history import RatingHistory
+
+
+@pytest.fixture
+def market():
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range('2023-01-02', periods=120)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (len(dates), 3)), axis=0))
+    return pd.DataFrame(prices, index=dates, columns=['AAA', 'BBB', VNINDEX_TICKER])
+
+
+def _restated_buys(dates: pd.DatetimeIndex):
+    # AAA: BUY được nhắc lại 10 phiên liên tiếp; BBB: BUY một lần
+    df_rec = pd.DataFrame(index=dates[:10].strftime('%Y-%m-%d'), columns=['AAA', 'BBB'], dtype=object)
+    df_rec['AAA'] = 'BUY'
+    df_rec.iloc[0, 1] = 'BUY'
+    history = RatingHistory.from_sheet(df_rec)
+    return {'Khuyen_nghi_BUY': history.point_ratings('BUY')}, history
+
+
+def _daily_returns(market: pd.DataFrame) -> pd.DataFrame:
+    return market.pct_change().fillna(0.0)
+
+
+def test_restated_signals_do_not_stack(market):
+    results, history = _restated_buys(market.index)
+    nav_df, stats = run_backtest(results, market, ['Khuyen_nghi_BUY'], history=history)
+
+    assert stats['Số sự kiện'] == 11
+    returns = _daily_returns(market).loc[nav_df.index[1:]]
+    expected = 0.5 * returns['AAA'] + 0.5 * returns['BBB']
+    np.testing.assert_allclose(nav_df['NAV'].pct_change().iloc[1:], expected, atol=1e-12)
+    assert (nav_df['Số vị thế'].iloc[1:] == 2).all()
+
+
+def test_custom_weights_are_per_ticker(market):
+    results, history = _restated_buys(market.index)
+    nav_df, _ = run_backtest(results, market, ['Khuyen_nghi_BUY'], history=history, weights={'AAA': 3, 'BBB': 1})
+
+    returns = _daily_returns(market).loc[nav_df.index[1:]]
+    expected = 0.75 * returns['AAA'] + 0.25 * returns['BBB']
+    np.testing.assert_allclose(nav_df['NAV'].pct_change().iloc[1:], expected, atol=1e-12)
+
+
+def test_single_event_fixed_holding(market):
+    entry = market.index[5]
+    results = {'Khuyen_nghi_BUY': pd.DataFrame({'Cổ phiếu': ['AAA'], 'Ngày khuyến nghị': [entry.strftime('%Y-%m-%d')]})}
+    nav_df, stats = run_backtest(results, market, ['Khuyen_nghi_BUY'], holding_offset=DateOffset(months=1))
+
+    exit_ = market.index[market.index <= entry + DateOffset(months=1)][-1]
+    assert stats['Lợi nhuận tích lũy'] == pytest.approx(market.loc[exit_, 'AAA'] / market.loc[entry, 'AAA'] - 1)
+
+
+def test_short_signal_is_inverted(market):
+    entry = market.index[0]
+    results = {'Khuyen_nghi_UnderPerform': pd.DataFrame({'Cổ phiếu': ['BBB'], 'Ngày khuyến nghị': [entry.strftime('%Y-%m-%d')]})}
+    nav_df, _ = run_backtest(results, market, ['Khuyen_nghi_UnderPerform'], holding_offset=DateOffset(months=1))
+
+    returns = _daily_returns(market).loc[nav_df.index[1:], 'BBB']
+    held = nav_df['Số vị thế'].iloc[1:] > 0
+    np.testing.assert_allclose(nav_df['NAV'].pct_change().iloc[1:][held], -returns[held], atol=1e-12)
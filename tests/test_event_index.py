@@ -0,0 +1,99 @@
+# tests/test_event_index.py
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.tseries.offsets import DateOffset
+
+from src.analyzer import process_stock_data
+from src.event_index import EventIndex, build_event_indexes, filter_results
+from conftest import make_workbook
+
+NAMES = ["Out_sang_MarketPerform", "MarketPerform_sang_Out", "Khuyen_nghi_BUY", "Khuyen_nghi_UnderPerform"]
+
+
+def _reference_filter(df: pd.DataFrame, tickers=None, start_date=None, end_date=None, rating=None, min_alpha=None) -> pd.DataFrame:
+    """
+    Bộ lọc tham chiếu bằng mask boolean của pandas trên toàn bảng.
+    """
+    if df.empty:
+        return df
+    date_col = next(col for col in df.columns if 'Ngày' in col)
+    dates = pd.to_datetime(df[date_col])
+    mask = pd.Series(True, index=df.index)
+    if tickers:
+        mask &= df['Cổ phiếu'].isin(tickers)
+    if start_date is not None:
+        mask &= dates >= pd.Timestamp(start_date)
+    if end_date is not None:
+        mask &= dates <= pd.Timestamp(end_date)
+    if rating is not None:
+        mask &= df['Rating'] == rating
+    if min_alpha is not None:
+        vs_col = next(col for col in df.columns if 'vs VNINDEX' in col)
+        alpha = df[vs_col].map(lambda v: float(v.rstrip('%')) / 100 if isinstance(v, str) and v.endswith('%') else np.nan)
+        mask &= alpha >= min_alpha
+    return df[mask]
+
+
+@pytest.fixture(scope='module')
+def results():
+    # Giá kết thúc trước các khuyến nghị cuối -> các sự kiện đó có rating 'N/A'
+    df_rec, df_price = make_workbook(n_days=300, n_tickers=12, ratings_per_ticker=12, seed=3)
+    cutoff = pd.Timestamp('2020-01-01') + pd.tseries.offsets.BDay(280)
+    df_price = df_price[df_price['Date'] < cutoff]
+    tables = dict(zip(NAMES, process_stock_data(df_rec, df_price, DateOffset(months=6), '6T')))
+    tables['Rỗng'] = pd.DataFrame()
+    return tables
+
+
+def _assert_same(results, **filters):
+    got = filter_results(build_event_indexes(results), **filters)
+    for name, df in results.items():
+        expected = _reference_filter(df, **filters)
+        assert got[name].equals(expected), (name, filters)
+
+
+def test_random_filter_combinations_match_pandas(results):
+    rng = np.random.default_rng(0)
+    tickers = [f'T{i:02d}' for i in range(12)] + ['ZZZ']
+    days = pd.bdate_range('2020-01-01', periods=320)
+    for _ in range(200):
+        filters = {}
+        if rng.random() < 0.5:
+            filters['tickers'] = list(rng.choice(tickers, rng.integers(1, 5), replace=False))
+        if rng.random() < 0.5:
+            filters['start_date'] = days[rng.integers(0, len(days))].date()
+        if rng.random() < 0.5:
+            filters['end_date'] = days[rng.integers(0, len(days))].date()
+        if rng.random() < 0.4:
+            filters['rating'] = str(rng.choice(['Outperform', 'Underperform', 'N/A']))
+        if rng.random() < 0.4:
+            filters['min_alpha'] = float(rng.normal(0, 0.05))
+        _assert_same(results, **filters)
+
+
+def test_na_rows_exist_and_are_dropped_by_min_alpha(results):
+    assert any((df['Rating'] == 'N/A').any() for df in results.values() if not df.empty)
+    _assert_same(results, rating='N/A')
+    _assert_same(results, min_alpha=-1.0)
+    filtered = filter_results(build_event_indexes(results), min_alpha=-1.0)
+    assert not any((df['Rating'] == 'N/A').any() for df in filtered.values() if not df.empty)
+
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'tickers': ['ZZZ']},
+    {'tickers': ['T01', 'ZZZ']},
+    {'start_date': '2020-06-01'},
+    {'end_date': '2020-06-01'},
+    {'tickers': ['T02'], 'end_date': '2020-09-30'},
+    {'start_date': '2021-06-01', 'end_date': '2020-06-01'},
+])
+def test_edge_cases_match_pandas(results, filters):
+    _assert_same(results, **filters)
+
+
+def test_empty_table():
+    index = EventIndex(pd.DataFrame())
+    assert len(index) == 0
+    assert index.filter(tickers=['T01'], min_alpha=0.0).empty
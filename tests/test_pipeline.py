@@ -0,0 +1,81 @@
+# tests/test_pipeline.py
+import datetime
+import os
+
+import pytest
+from pandas.tseries.offsets import DateOffset
+
+import src.pipeline as pipeline
+from conftest import make_workbook
+
+PERIODS = [(DateOffset(months=3), '3T'), (DateOffset(months=6), '6T')]
+URL = 'https://docs.google.com/spreadsheets/d/test/edit'
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    df_rec, df_price = make_workbook()
+    monkeypatch.setattr(pipeline, 'PRICE_SNAPSHOT_DIR', str(tmp_path))
+    monkeypatch.setattr(pipeline, 'fetch_workbook',
+                        lambda url, rec_sheet, price_sheet: (df_rec.copy(), df_price.copy() if price_sheet else df_price.iloc[:0]))
+    return pipeline.dataset_path(URL, 'Sheet1', 'Price')
+
+
+def _build():
+    return pipeline.build_dataset(URL, 'Sheet1', 'Price', PERIODS)
+
+
+def test_unchanged_source_reuses_previous(source):
+    dataset = _build()
+    assert pipeline.build_dataset(URL, 'Sheet1', 'Price', PERIODS, previous=dataset) is dataset
+
+
+def test_saved_dataset_is_served_after_restart(source):
+    dataset = _build()
+    as_of = datetime.datetime(2024, 5, 1, 9, 30)
+    assert pipeline.save_dataset(source, dataset, as_of, as_of)
+
+    loaded = pipeline.load_dataset(source, ['3T', '6T'])
+    assert loaded is not None
+    restored, restored_as_of, _ = loaded
+    assert restored_as_of == as_of
+    assert restored['version'] == dataset['version']
+    assert restored['prices_pivot'].equals(dataset['prices_pivot'])
+    for label, analysis in dataset['analyses'].items():
+        for name, df in analysis['results'].items():
+            assert restored['analyses'][label]['results'][name].equals(df)
+        assert restored['analyses'][label]['cube'].win_rate_summary().equals(analysis['cube'].win_rate_summary())
+
+    # Bản đã khôi phục vẫn được nhận là cùng phiên bản nguồn
+    assert pipeline.build_dataset(URL, 'Sheet1', 'Price', PERIODS, previous=restored) is restored
+
+
+def test_saved_dataset_is_ignored_when_stale(source):
+    dataset = _build()
+    pipeline.save_dataset(source, dataset, datetime.datetime.now(), datetime.datetime.now())
+
+    assert pipeline.load_dataset(source, ['3T', '6T', '1Y']) is None
+    os.remove(os.path.join(os.path.dirname(source), dataset['version'][1], 'meta.json'))
+    assert pipeline.load_dataset(source, ['3T', '6T']) is None
+
+
+def test_missing_dataset(source):
+    assert pipeline.load_dataset(source, ['3T', '6T']) is None
+
+
+def test_unreadable_dataset_is_ignored(source, monkeypatch):
+    dataset = _build()
+    pipeline.save_dataset(source, dataset, datetime.datetime.now(), datetime.datetime.now())
+
+    # Mô phỏng lỗi unpickle sau khi nâng cấp thư viện
+    def broken_load(f):
+        raise TypeError("không tương thích")
+    monkeypatch.setattr(pipeline.pickle, 'load', broken_load)
+    assert pipeline.load_dataset(source, ['3T', '6T']) is None
+
+
+def test_corrupt_dataset_is_ignored(source):
+    os.makedirs(os.path.dirname(source), exist_ok=True)
+    with open(source, 'wb') as f:
+        f.write(b'not a pickle')
+    assert pipeline.load_dataset(source, ['3T', '6T']) is None
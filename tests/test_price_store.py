@@ -0,0 +1,112 @@
+# tests/test_price_store.py
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from src import price_store
+from src.analyzer import prepare_price_pivot
+from conftest import make_workbook
+
+
+@pytest.fixture
+def df_price():
+    return make_workbook(n_days=60, n_tickers=4)[1]
+
+
+def _write(df_price: pd.DataFrame, source_dir: str, version: str) -> str:
+    return price_store.write_price_snapshot(prepare_price_pivot(df_price.copy()), source_dir, version)
+
+
+def _current(source_dir: str) -> str:
+    with open(os.path.join(source_dir, 'CURRENT'), encoding='utf-8') as f:
+        return f.read()
+
+
+def test_load_price_matrix_round_trip(tmp_path, df_price):
+    source_dir = str(tmp_path)
+    prices_pivot = price_store.load_price_matrix(df_price.copy(), source_dir)
+
+    assert prices_pivot.equals(prepare_price_pivot(df_price.copy()))
+    version = price_store.price_fingerprint(df_price)
+    assert _current(source_dir) == version
+    assert price_store.latest_price_snapshot(source_dir) == os.path.join(source_dir, version)
+
+
+def test_latest_snapshot_expires_after_max_age(tmp_path, df_price):
+    source_dir = str(tmp_path)
+    snapshot_dir = _write(df_price, source_dir, 'v1')
+    assert price_store.latest_price_snapshot(source_dir, max_age=60) == snapshot_dir
+
+    # Tuổi tính theo lần cuối CURRENT được ghi
+    old = time.time() - 120
+    os.utime(os.path.join(source_dir, 'CURRENT'), (old, old))
+    assert price_store.latest_price_snapshot(source_dir, max_age=60) is None
+    assert price_store.latest_price_snapshot(source_dir) == snapshot_dir
+
+
+def test_missing_or_broken_snapshot(tmp_path, df_price):
+    source_dir = str(tmp_path)
+    assert price_store.latest_price_snapshot(source_dir) is None
+
+    snapshot_dir = _write(df_price, source_dir, 'v1')
+    os.remove(os.path.join(snapshot_dir, 'meta.json'))
+    assert price_store.latest_price_snapshot(source_dir) is None
+
+
+def test_prune_keeps_current_snapshot(tmp_path, df_price):
+    source_dir = str(tmp_path)
+    for version in ['v1', 'v2', 'v3']:
+        _write(df_price, source_dir, version)
+        # Đảm bảo thứ tự created_at khác nhau
+        time.sleep(0.01)
+
+    remaining = sorted(name for name in os.listdir(source_dir) if os.path.isdir(os.path.join(source_dir, name)))
+    assert remaining == ['v2', 'v3']
+    assert _current(source_dir) == 'v3'
+    assert price_store.latest_price_snapshot(source_dir) == os.path.join(source_dir, 'v3')
+
+    # CURRENT trỏ về bản cũ hơn (dữ liệu giá quay lại phiên bản trước) -> bản đó không bị xóa
+    price_store._set_current(source_dir, 'v2')
+    price_store.prune_price_snapshots(source_dir, keep=1)
+    remaining = sorted(name for name in os.listdir(source_dir) if os.path.isdir(os.path.join(source_dir, name)))
+    assert remaining == ['v2', 'v3']
+    assert price_store.latest_price_snapshot(source_dir) == os.path.join(source_dir, 'v2')
+
+
+def test_second_writer_keeps_existing_snapshot(tmp_path, df_price):
+    source_dir = str(tmp_path)
+    snapshot_dir = _write(df_price, source_dir, 'v1')
+    created_at = price_store.snapshot_created_at(snapshot_dir)
+
+    other = df_price.copy()
+    other['Price'] = other['Price'] * 2
+    assert _write(other, source_dir, 'v1') == snapshot_dir
+    assert price_store.snapshot_created_at(snapshot_dir) == created_at
+    assert price_store.open_price_snapshot(snapshot_dir).equals(prepare_price_pivot(df_price.copy()))
+    assert not [name for name in os.listdir(source_dir) if name.startswith('.')]
+
+
+def test_concurrent_current_updates(tmp_path, df_price):
+    source_dir = str(tmp_path)
+    _write(df_price, source_dir, 'v1')
+    errors = []
+
+    def update():
+        try:
+            for _ in range(50):
+                price_store._set_current(source_dir, 'v1')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=update) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert _current(source_dir) == 'v1'
+    assert not [name for name in os.listdir(source_dir) if name.startswith('.')]
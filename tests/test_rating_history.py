@@ -0,0 +1,94 @@
+# tests/test_rating_history.py
+import numpy as np
+import pandas as pd
+
+from src.rating_history import RatingHistory
+
+
+def _clean_sheet(df_rec: pd.DataFrame) -> pd.DataFrame:
+    """
+    Làm sạch sheet khuyến nghị như process_stock_data trước khi có RatingHistory.
+    """
+    df_rec = df_rec.dropna(axis=1, how='all')
+    df_rec = df_rec.loc[:, ~df_rec.columns.str.contains('^Unnamed')]
+    df_rec.index = pd.to_datetime(df_rec.index, errors='coerce')
+    df_rec = df_rec.dropna(axis=0, how='all')
+    df_rec = df_rec[df_rec.index.notna()]
+    return df_rec.sort_index()
+
+
+def _legacy_transitions(df_rec: pd.DataFrame, from_rating: str, to_rating: str) -> set:
+    # Logic cũ: ffill toàn bộ sheet rồi so với hàng trước đó
+    df_filled = df_rec.ffill()
+    df_shifted = df_filled.shift(1)
+    cond = (df_filled == to_rating) & (df_shifted == from_rating)
+    return {(stock, date) for stock in cond.columns for date in cond.index[cond[stock]]}
+
+
+def _legacy_point_ratings(df_rec: pd.DataFrame, rating: str) -> set:
+    return {(stock, date) for stock in df_rec.columns for date in df_rec.index[df_rec[stock] == rating]}
+
+
+def _as_set(df: pd.DataFrame, date_col: str) -> set:
+    return set(zip(df['Cổ phiếu'], pd.to_datetime(df[date_col])))
+
+
+def test_transitions_match_ffill_shift(workbook):
+    df_rec, _ = workbook
+    legacy = _clean_sheet(df_rec)
+    history = RatingHistory.from_sheet(df_rec)
+
+    for from_rating, to_rating in [('OUTPERFORM', 'MARKET-PERFORM'), ('MARKET-PERFORM', 'OUTPERFORM')]:
+        got = history.transitions(from_rating, to_rating, 'Ngày thay đổi')
+        assert len(got) == len(_as_set(got, 'Ngày thay đổi'))
+        assert _as_set(got, 'Ngày thay đổi') == _legacy_transitions(legacy, from_rating, to_rating)
+
+
+def test_point_ratings_match_sheet_cells(workbook):
+    df_rec, _ = workbook
+    legacy = _clean_sheet(df_rec)
+    history = RatingHistory.from_sheet(df_rec)
+
+    for rating in ['BUY', 'UNDER-PERFORM']:
+        got = history.point_ratings(rating, 'Ngày khuyến nghị')
+        assert len(got) == len(_as_set(got, 'Ngày khuyến nghị'))
+        assert _as_set(got, 'Ngày khuyến nghị') == _legacy_point_ratings(legacy, rating)
+
+
+def test_repeated_rating_is_not_a_transition():
+    df_rec = pd.DataFrame(
+        {'AAA': ['OUTPERFORM', 'OUTPERFORM', None, 'MARKET-PERFORM', 'MARKET-PERFORM'],
+         'BBB': [None, 'MARKET-PERFORM', 'OUTPERFORM', None, 'OUTPERFORM']},
+        index=['2023-01-02', '2023-01-03', '2023-01-04', '2023-01-05', '2023-01-06']
+    )
+    history = RatingHistory.from_sheet(df_rec)
+
+    assert _as_set(history.transitions('OUTPERFORM', 'MARKET-PERFORM'), 'Ngày thay đổi') == {('AAA', pd.Timestamp('2023-01-05'))}
+    assert _as_set(history.transitions('MARKET-PERFORM', 'OUTPERFORM'), 'Ngày thay đổi') == {('BBB', pd.Timestamp('2023-01-04'))}
+
+
+def test_rating_as_of_matches_ffill(workbook):
+    df_rec, _ = workbook
+    filled = _clean_sheet(df_rec).ffill()
+    history = RatingHistory.from_sheet(df_rec)
+
+    for date in ['2020-01-01', '2020-03-16', '2020-09-30', '2021-02-01']:
+        expected = filled.loc[:date]
+        expected = expected.iloc[-1] if len(expected) else pd.Series(np.nan, index=filled.columns)
+        got = history.rating_as_of(date)
+        for ticker in filled.columns:
+            assert got[ticker] == expected[ticker] or (pd.isna(got[ticker]) and pd.isna(expected[ticker]))
+            assert history.rating_of(ticker, date) == (None if pd.isna(expected[ticker]) else expected[ticker])
+
+
+def test_next_change_dates():
+    df_rec = pd.DataFrame(
+        {'AAA': ['BUY', None, 'BUY', 'UNDER-PERFORM'],
+         'BBB': ['OUTPERFORM', None, None, None]},
+        index=['2023-01-02', '2023-01-03', '2023-01-04', '2023-01-05']
+    )
+    history = RatingHistory.from_sheet(df_rec)
+
+    got = history.next_change_dates(['AAA', 'AAA', 'BBB', 'ZZZ'], ['2023-01-02', '2023-01-05', '2023-01-02', '2023-01-02'])
+    expected = np.array(['2023-01-05', 'NaT', 'NaT', 'NaT'], dtype='datetime64[ns]')
+    np.testing.assert_array_equal(got, expected)
@@ -0,0 +1,178 @@
+# tests/test_single_flight.py
+import datetime
+import threading
+import time
+
+import pytest
+
+from src.refresher import BackgroundRefresher, DataSnapshot, get_or_start_refresher
+from src.single_flight import SingleFlight
+
+N_CALLERS = 5
+
+
+def _wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Hết thời gian chờ"
+        time.sleep(0.005)
+
+
+def _run_concurrently(target, n: int = N_CALLERS):
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def test_waiters_share_leader_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def load():
+        executions.append(1)
+        release.wait(5)
+        return {'data': 42}
+
+    outcomes = []
+    threads = _run_concurrently(lambda: outcomes.append(flight.do(('dataset', 'src'), load)))
+    _wait_until(lambda: flight.metrics()['coalesced'] == N_CALLERS - 1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(executions) == 1
+    assert len(outcomes) == N_CALLERS and all(result is outcomes[0] for result in outcomes)
+    metrics = flight.metrics()
+    assert (metrics['calls'], metrics['executions'], metrics['coalesced'], metrics['in_flight']) == (N_CALLERS, 1, N_CALLERS - 1, 0)
+    assert metrics['coalesced_by_kind'] == {'dataset': N_CALLERS - 1}
+
+
+def test_waiters_share_leader_error():
+    flight = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def load():
+        executions.append(1)
+        release.wait(5)
+        raise FileNotFoundError('thiếu sheet')
+
+    errors = []
+
+    def call():
+        try:
+            flight.do(('dataset', 'src'), load)
+        except FileNotFoundError as e:
+            errors.append(e)
+
+    threads = _run_concurrently(call)
+    _wait_until(lambda: flight.metrics()['coalesced'] == N_CALLERS - 1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(executions) == 1
+    assert len(errors) == N_CALLERS and all(e is errors[0] for e in errors)
+    assert flight.metrics()['errors'] == 1
+
+
+def test_key_is_released_after_completion():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError('lỗi')
+
+    assert flight.do('k', lambda: 1) == 1
+    with pytest.raises(ValueError):
+        flight.do('k', fail)
+    assert flight.do('k', lambda: 2) == 2
+    metrics = flight.metrics()
+    assert (metrics['executions'], metrics['coalesced'], metrics['errors'], metrics['in_flight']) == (3, 0, 1, 0)
+
+
+def test_cold_start_sessions_join_background_build():
+    flight = SingleFlight()
+    release = threading.Event()
+    builds = []
+
+    def build(previous):
+        builds.append(previous)
+        release.wait(5)
+        return {'version': len(builds)}
+
+    refresher = BackgroundRefresher(build, interval=3600, key='src', flight=flight).start()
+    _wait_until(lambda: flight.metrics()['in_flight'] == 1)
+
+    snapshots = []
+    threads = _run_concurrently(lambda: snapshots.append(refresher.ensure_ready()))
+    _wait_until(lambda: flight.metrics()['coalesced'] == N_CALLERS)
+    release.set()
+    for thread in threads:
+        thread.join()
+    refresher.stop()
+
+    assert builds == [None]
+    assert len(snapshots) == N_CALLERS and all(s is refresher.latest() for s in snapshots)
+    assert flight.metrics()['executions'] == 1
+
+
+def test_failed_refresh_keeps_previous_snapshot():
+    flight = SingleFlight()
+    outcomes = iter([{'version': 1}, RuntimeError('mất kết nối')])
+
+    def build(previous):
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    refresher = BackgroundRefresher(build, interval=3600, flight=flight)
+    first = refresher.ensure_ready()
+    assert refresher.ensure_ready() is first
+
+    with pytest.raises(RuntimeError):
+        refresher.refresh_once()
+    assert refresher.latest() is first
+    assert isinstance(refresher.last_error, RuntimeError)
+
+
+def test_restored_snapshot_is_rebuilt_on_first_refresh():
+    restored = {'version': 'v1', 'results': 'cũ'}
+    seen = []
+
+    def build(previous):
+        # Nguồn không đổi: hàm build trả lại đúng bản trước nếu được truyền vào
+        seen.append(previous)
+        return previous if previous is not None else {'version': 'v1', 'results': 'mới'}
+
+    now = datetime.datetime.now()
+    refresher = BackgroundRefresher(build, interval=3600, flight=SingleFlight(),
+                                    initial=DataSnapshot(restored, now, now, verified=False))
+    assert refresher.ensure_ready().data is restored
+
+    first = refresher.refresh_once()
+    assert seen == [None]
+    assert first.data['results'] == 'mới' and first.verified
+
+    assert refresher.refresh_once().data is first.data
+    assert seen[-1] is first.data
+
+
+def test_one_refresher_per_source():
+    created = []
+
+    def create():
+        refresher = BackgroundRefresher(lambda previous: {'version': 1}, interval=3600, flight=SingleFlight())
+        created.append(refresher)
+        return refresher
+
+    first = get_or_start_refresher(('test', 'nguồn-a'), create)
+    second = get_or_start_refresher(('test', 'nguồn-a'), create)
+    other = get_or_start_refresher(('test', 'nguồn-b'), create)
+    for refresher in created:
+        refresher.stop()
+
+    assert first is second and first is not other
+    assert len(created) == 2
@@ -0,0 +1,48 @@
+# tests/test_win_rate_cube.py
+import numpy as np
+import pandas as pd
+from pandas.tseries.offsets import DateOffset
+
+from src.analyzer import process_stock_data, calculate_win_rate_summary, parse_percentages
+from src.win_rate_cube import WinRateCube, UNKNOWN_SECTOR
+
+NAMES = ["Out_sang_MarketPerform", "MarketPerform_sang_Out", "Khuyen_nghi_BUY", "Khuyen_nghi_UnderPerform"]
+
+
+def _results(workbook):
+    df_rec, df_price = workbook
+    return dict(zip(NAMES, process_stock_data(df_rec, df_price, DateOffset(months=6), '6T')))
+
+
+def test_win_rate_summary_matches_calculate_win_rate_summary(workbook):
+    results = _results(workbook)
+    cube = WinRateCube.from_results(results)
+
+    assert cube.win_rate_summary().equals(calculate_win_rate_summary(results))
+
+
+def test_ticker_filter_matches_filtered_results(workbook):
+    results = _results(workbook)
+    cube = WinRateCube.from_results(results)
+    tickers = ['T01', 'T03']
+
+    filtered = {name: df[df['Cổ phiếu'].isin(tickers)] for name, df in results.items()}
+    assert cube.win_rate_summary({'Cổ phiếu': tickers}).equals(calculate_win_rate_summary(filtered))
+
+
+def test_sector_rollup_sums_cells(workbook):
+    results = _results(workbook)
+    cube = WinRateCube.from_results(results, {'T01': 'Ngân hàng', 'T02': 'Ngân hàng'})
+
+    by_sector = cube.rollup(['Ngành']).set_index('Ngành')
+    assert set(by_sector.index) == {'Ngân hàng', UNKNOWN_SECTOR}
+    assert by_sector['Số sự kiện'].sum() == sum(len(df) for df in results.values())
+    bank_events = sum(df['Cổ phiếu'].isin(['T01', 'T02']).sum() for df in results.values())
+    assert by_sector.loc['Ngân hàng', 'Số sự kiện'] == bank_events
+
+
+def test_parse_percentages():
+    values = pd.Series(['-3.25%', ' 5.80 %', '0.00%', 'N/A', '5', None, 0.05, 'abc%'])
+    expected = [-0.0325, 0.058, 0.0, np.nan, np.nan, np.nan, np.nan, np.nan]
+    np.testing.assert_allclose(parse_percentages(values), expected)
+    assert len(parse_percentages(pd.Series([], dtype=object))) == 0